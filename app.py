@@ -1,3 +1,8 @@
+import base64
+import json
+import os
+import threading
+from collections import OrderedDict
 from textwrap import dedent
 
 import dash
@@ -5,13 +10,38 @@ import dash_core_components as dcc
 import dash_html_components as html
 import dash_player as player
 import numpy as np
-import pandas as pd
 import plotly.graph_objs as go
-from dash.dependencies import Input, Output, State
+import plotly.utils
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from dash.exceptions import PreventUpdate
+
+from utils.detection_store import is_url, load_detections
+from utils.figure_cache import FigureCache
+from utils.footage_catalog import FootageCatalog
+from utils.footage_store import build_detection_arrays, footage_store_path, get_frame_detections, load_footage_store
+from utils.frame_tiles import (build_frame_tiles, build_timeline, frame_tiles_path, get_frame_aggregates,
+                               load_frame_tiles)
 
 
 DEBUG = True
+# Frame rate of the footages whose catalog entry doesn't specify one
 FRAMERATE = 6.0
+# The manifest listing the footages of the dashboard, see utils/footage_catalog.py
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'catalog.json')
+# Bounds of the cache of rendered figures, shared by all the sessions of a worker
+FIGURE_CACHE_MAX_ENTRIES = 4096
+FIGURE_CACHE_MAX_BYTES = 64 * 1024 ** 2
+# Maximum number of footages kept loaded by a worker, the least recently requested ones are evicted first
+MAX_LOADED_FOOTAGE = 4
+# Color of the boxes drawn over the video in the bounding box display mode
+BOX_COLOR = 'rgb(250,79,86)'
+# Aggregate the frames in the browser, from the detections of the footage sent once when it is selected, instead of
+# sending the aggregates of every frame from the server. The figures are assembled in the browser either way, see
+# assets/clientside.js
+CLIENTSIDE_FIGURES = True
+# Maximum number of points of the timeline of a footage, and number of classes it displays (the most detected ones)
+TIMELINE_BINS = 500
+TIMELINE_MAX_CLASSES = 8
 
 app = dash.Dash(__name__)
 server = app.server
@@ -20,18 +50,161 @@ app.scripts.config.serve_locally = True
 app.config['suppress_callback_exceptions'] = True
 
 
-def load_data(path):
+def payload_size(payload):
+    """Estimate the memory used by a cached payload from the size of its JSON serialization."""
+    return len(json.dumps(payload, cls=plotly.utils.PlotlyJSONEncoder))
+
+
+# Cache of the data of the frames sent to the browser, keyed by (footage, frame, threshold), or
+# ("boxes", footage, frame, threshold) for the boxes of the overlay, and ("timeline", footage, threshold) for the
+# timeline
+figure_cache = FigureCache(max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES,
+                           sizeof=payload_size)
+
+# Data Loading
+footage_catalog = FootageCatalog(CATALOG_PATH)
+
+# The footages loaded by the worker, least recently requested first
+loaded_footage = OrderedDict()
+loaded_footage_lock = threading.Lock()
+
+
+# Static figure layouts
+BAR_LAYOUT = go.Layout(
+    showlegend=False,
+    paper_bgcolor='rgb(249,249,249)',
+    plot_bgcolor='rgb(249,249,249)',
+    xaxis={
+        'automargin': True,
+    },
+    yaxis={
+        'title': 'Score',
+        'automargin': True,
+        'range': [0, 1]
+    }
+)
+
+PIE_LAYOUT = go.Layout(
+    showlegend=False,
+    paper_bgcolor='rgb(249,249,249)',
+    plot_bgcolor='rgb(249,249,249)',
+    autosize=False,
+    margin=go.layout.Margin(
+        l=10,
+        r=10,
+        t=15,
+        b=15
+    )
+)
+
+HEATMAP_LAYOUT = go.Layout(
+    showlegend=False,
+    paper_bgcolor='rgb(249,249,249)',
+    plot_bgcolor='rgb(249,249,249)',
+    autosize=False,
+    margin=go.layout.Margin(
+        l=10,
+        r=10,
+        b=20,
+        t=20,
+        pad=4
+    )
+)
+
+# Layouts of the figures of a frame, and colors of the pie chart
+SCORE_BAR_LAYOUT = {
+    'showlegend': False,
+    'autosize': False,
+    'paper_bgcolor': 'rgb(249,249,249)',
+    'plot_bgcolor': 'rgb(249,249,249)',
+    'xaxis': {'automargin': True, 'tickangle': -45},
+    'yaxis': {'automargin': True, 'range': [0, 1], 'title': {'text': 'Score'}}
+}
+
+CONFIDENCE_HEATMAP_LAYOUT = {
+    'showlegend': False,
+    'autosize': False,
+    'paper_bgcolor': 'rgb(249,249,249)',
+    'plot_bgcolor': 'rgb(249,249,249)',
+    'margin': {'l': 10, 'r': 10, 'b': 20, 't': 20, 'pad': 2},
+    'xaxis': {'showticklabels': False, 'showgrid': False, 'side': 'top', 'ticks': ''},
+    'yaxis': {'showticklabels': False, 'showgrid': False, 'side': 'left', 'ticks': ''}
+}
+
+TIMELINE_LAYOUT = {
+    'showlegend': True,
+    'legend': {'orientation': 'h', 'y': -0.3},
+    'hovermode': 'x',
+    'paper_bgcolor': 'rgb(249,249,249)',
+    'plot_bgcolor': 'rgb(249,249,249)',
+    'margin': {'l': 40, 'r': 10, 'b': 30, 't': 10},
+    'xaxis': {'title': {'text': 'Время, с'}, 'fixedrange': True},
+    'yaxis': {'title': {'text': 'Объекты'}, 'fixedrange': True, 'rangemode': 'tozero'}
+}
+
+PIE_COLORS = ['#fa4f56', '#fe6767', '#ff7c79', '#ff908b', '#ffa39d', '#ffb6b0', '#ffc8c3', '#ffdbd7', '#ffedeb',
+              '#ffffff']
+
+# Transparent layout drawn over the video, in the normalized coordinates of the boxes (y pointing down)
+OVERLAY_LAYOUT = go.Layout(
+    showlegend=False,
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    margin=go.layout.Margin(
+        l=0,
+        r=0,
+        b=0,
+        t=0,
+        pad=0
+    ),
+    xaxis={'range': [0, 1], 'visible': False, 'fixedrange': True},
+    yaxis={'range': [1, 0], 'visible': False, 'fixedrange': True}
+)
+
+# Everything static about the figures, sent once with the layout of the app. The callbacks then only send the data
+FIGURE_STYLES = {
+    'layouts': {
+        'bar': SCORE_BAR_LAYOUT,
+        'pie': PIE_LAYOUT.to_plotly_json(),
+        'heatmap': CONFIDENCE_HEATMAP_LAYOUT,
+        'timeline': TIMELINE_LAYOUT,
+        'empty_bar': BAR_LAYOUT.to_plotly_json(),
+        'empty_heatmap': HEATMAP_LAYOUT.to_plotly_json(),
+        'overlay': OVERLAY_LAYOUT.to_plotly_json()
+    },
+    'pie_colors': PIE_COLORS,
+    'box_color': BOX_COLOR
+}
+
+
+def load_data(path, store_path=None):
     """Load data about a specific footage (given by the path). It returns a dictionary of useful variables such as
-    the dataframe containing all the detection and bounds localization, the number of classes inside that footage,
-    the matrix of all the classes in string, the given class with padding, and the root of the number of classes,
-    rounded."""
+    the arrays containing all the detection and bounds localization, the per-frame aggregates of the detections
+    (see utils/frame_tiles.py), the list of classes, the cell and label of each class in the heatmap, and the root
+    of the number of classes, rounded. If the footage has a memory-mapped store (see utils/footage_store.py), given
+    by store_path or next to local detections, the arrays are opened read-only from it."""
 
-    # Load the dataframe containing all the processed object detections inside the video
     print(path)
-    video_info_df = pd.read_csv(path)
+    if store_path is None and not is_url(path):
+        store_path = footage_store_path(path)
 
-    # The list of classes, and the number of classes
-    classes_list = video_info_df["class_str"].value_counts().index.tolist()
+    if store_path is not None and os.path.isdir(store_path):
+        # Open the memory-mapped store of the footage, shared by all the workers through the page cache
+        store = load_footage_store(store_path)
+        detections, tiles = store["detections"], store["tiles"]
+    else:
+        # Load the dataframe containing all the processed object detections inside the video, indexed by frame
+        video_info_df = load_detections(path)
+        detections = build_detection_arrays(video_info_df)
+
+        # Load the per-frame aggregates written at ingest time, or compute them if the footage has none
+        try:
+            tiles = load_frame_tiles(frame_tiles_path(path))
+        except OSError:
+            tiles = build_frame_tiles(video_info_df)
+
+    # The list of classes (in the order of the tiles), and the number of classes
+    classes_list = tiles["classes"].tolist()
     n_classes = len(classes_list)
 
     # Gets the smallest value needed to add to the end of the classes list to get a square matrix
@@ -46,11 +219,23 @@ def load_data(path):
     # Flip it for better looks
     classes_matrix = np.flip(classes_matrix, axis=0)
 
+    # The cell of each class code inside the flattened (and flipped) heatmap
+    class_rows, class_columns = np.divmod(np.arange(n_classes), int(root_round))
+    class_cells = (int(root_round) - 1 - class_rows) * int(root_round) + class_columns
+
+    # The annotation of each cell, with a linebreak for multi-word classes
+    cell_labels = ['<br>'.join(label.split()) for label in classes_matrix.astype(dtype='|U40').ravel()]
+
+    # The frames having at least one detection, used to snap the current time to the nearest of them
+    detected_frames = np.flatnonzero(np.diff(detections["frame_offsets"]))
+
     data_dict = {
-        "video_info_df": video_info_df,
-        "n_classes": n_classes,
-        "classes_matrix": classes_matrix,
-        "classes_padded": classes_padded,
+        "detections": detections,
+        "detected_frames": detected_frames,
+        "tiles": tiles,
+        "classes_list": classes_list,
+        "class_cells": class_cells,
+        "cell_labels": cell_labels,
         "root_round": root_round
     }
 
@@ -60,6 +245,139 @@ def load_data(path):
     return data_dict
 
 
+def get_footage_data(footage):
+    """Return the data dictionary of the given footage (see load_data), loading it on its first request. At most
+    MAX_LOADED_FOOTAGE footages stay loaded, and the least recently requested one is evicted first."""
+    with loaded_footage_lock:
+        if footage in loaded_footage:
+            loaded_footage.move_to_end(footage)
+            return loaded_footage[footage]
+
+    # Load outside of the lock, so the requests for the footages already loaded are not blocked
+    entry = footage_catalog[footage]
+    footage_data = load_data(entry["detections"], entry["store"])
+
+    with loaded_footage_lock:
+        loaded_footage[footage] = footage_data
+        loaded_footage.move_to_end(footage)
+
+        while len(loaded_footage) > MAX_LOADED_FOOTAGE:
+            evicted_footage, _ = loaded_footage.popitem(last=False)
+            if DEBUG:
+                print(f'{evicted_footage} evicted.')
+
+    return footage_data
+
+
+def get_footage_fps(footage):
+    """Return the frame rate of the footage, from its catalog entry."""
+    return footage_catalog[footage]["fps"] or FRAMERATE
+
+
+def get_snap_window(footage):
+    """Return how many frames before and after the current frame it can be snapped to a frame with detections. Only
+    the footages whose frames were sampled by the ingest have frames the model didn't run on. With a stride, those
+    resolve to the nearest sampled frame (half the stride away at most, so a sampled frame without detections never
+    shows the detections of another one). In scene-change mode, the frames left out matched the last sampled frame,
+    which is held until the next one (at most max_gap frames later)."""
+    sampling = footage_catalog[footage]["sampling"]
+    if not sampling:
+        return 0, 0
+    if sampling["scene_threshold"] is not None:
+        return int(sampling["max_gap"]) - 1, 0
+    return int(sampling["stride"]) // 2, int(sampling["stride"]) // 2
+
+
+def resolve_frame(footage, frame):
+    """Resolve the frame at the current time of the player (computed in the browser with the frame rate of the
+    footage) to a frame of the footage. If that frame has no detections, it is snapped to the nearest frame with
+    detections within the window of get_snap_window (the previous one on a tie). Returns None past the last frame
+    of the footage."""
+    entry = footage_catalog[footage]
+
+    detected_frames = get_footage_data(footage)["detected_frames"]
+    frame_count = entry["frame_count"] or (int(detected_frames[-1]) if len(detected_frames) > 0 else 0)
+    if frame > frame_count or len(detected_frames) == 0:
+        return None
+
+    # The distances to the detected frames at or before the frame, and after it
+    snap_before, snap_after = get_snap_window(footage)
+    index = np.searchsorted(detected_frames, frame, side='right')
+    before = frame - int(detected_frames[index - 1]) if index > 0 else None
+    after = int(detected_frames[index]) - frame if index < len(detected_frames) else None
+
+    if before is not None and before <= snap_before and (after is None or after > snap_after or before <= after):
+        return frame - before
+    if after is not None and after <= snap_after:
+        return frame + after
+    return frame
+
+
+def get_frame_df(footage, frame):
+    """Return the detections of the given footage at the given frame, as a dataframe."""
+    return get_frame_detections(get_footage_data(footage)["detections"], frame)
+
+
+def encode_array(array, dtype):
+    """Encode an array as the base64 string of its little-endian buffer, decoded as a typed array in the browser."""
+    return {'dtype': dtype, 'data': base64.b64encode(np.ascontiguousarray(array, dtype=f'<{dtype}')).decode('ascii')}
+
+
+def build_footage_meta(footage):
+    """Build what the browser needs to render the figures of any frame of the footage: its classes, and the cell and
+    label of each class in the heatmap."""
+    footage_data = get_footage_data(footage)
+
+    return {
+        "footage": footage,
+        "classes": footage_data["classes_list"],
+        "root": int(footage_data["root_round"]),
+        "class_cells": footage_data["class_cells"].tolist(),
+        "cell_labels": footage_data["cell_labels"]
+    }
+
+
+def build_footage_payload(footage):
+    """Build the payload the browser aggregates the frames of the footage from (see assets/clientside.js): the
+    metadata of the footage, and the class code, score and box of every detection, indexed by frame with the
+    CSR-style frame offsets. The arrays are sent as binary buffers, so the payload stays small."""
+    footage_data = get_footage_data(footage)
+    detections = footage_data["detections"]
+
+    # The class codes of the detections, as codes into the classes of the tiles (the order of the heatmap cells)
+    tile_codes = {name: code for code, name in enumerate(footage_data["classes_list"])}
+    code_map = np.array([tile_codes.get(name, -1) for name in detections["class_categories"]], dtype=np.int16)
+
+    detected_frames = footage_data["detected_frames"]
+    frame_count = footage_catalog[footage]["frame_count"] or (int(detected_frames[-1]) if len(detected_frames) else 0)
+
+    return dict(
+        build_footage_meta(footage),
+        frame_count=frame_count,
+        snap_window=get_snap_window(footage),
+        frame_offsets=encode_array(detections["frame_offsets"], 'i4'),
+        class_codes=encode_array(code_map[np.asarray(detections["class_codes"])], 'i2'),
+        scores=encode_array(detections["score"], 'f4'),
+        boxes=encode_array(np.column_stack([detections[name] for name in ("x", "y", "right", "bottom")]), 'f4')
+    )
+
+
+def build_timeline_data(footage, threshold):
+    """Build the timeline of the number of objects of the most detected classes over the footage, for a threshold in
+    percent. The timeline is computed from the tiles, and downsampled to at most TIMELINE_BINS points."""
+    footage_data = get_footage_data(footage)
+    bin_frames, counts = build_timeline(footage_data["tiles"], threshold, TIMELINE_BINS)
+
+    # The classes of the tiles are ordered by decreasing number of detections
+    n_classes = min(TIMELINE_MAX_CLASSES, counts.shape[1])
+    return {
+        "footage": footage,
+        "times": np.round(bin_frames / get_footage_fps(footage), 3).tolist(),
+        "classes": footage_data["classes_list"][:n_classes],
+        "counts": counts[:, :n_classes].T.tolist()
+    }
+
+
 def markdown_popup():
     return html.Div(
         id='markdown',
@@ -104,204 +422,228 @@ def markdown_popup():
 
 
 # Main App
-
-app.layout = html.Div(
-    children=[
-        html.Div(
-            id='top-bar',
-            className='row',
-            style={'backgroundColor': '#fa4f56',
-                   'height': '5px',
-                   }
-        ),
-        html.Div(
-            className='container',
-            children=[
-        html.Div(
-            id='left-side-column',
-            className='eight columns',
-            style={'display': 'flex',
-                   'flexDirection': 'column',
-                   'flex': 1,
-                   'height': 'calc(100vh - 5px)',
-                   'backgroundColor': '#F2F2F2',
-                   'overflow-y': 'scroll',
-                   'marginLeft': '0px',
-                   'justifyContent': 'flex-start',
-                   'alignItems': 'center'},
-            children=[
-                html.Div(
-                    id='header-section',
-                    children=[
-                        html.H4(
-                            'Детектирование объектов ГПН'
-                        ),
-                        html.P(
-                            'Выберите видеоролик для просмотра и режим отображения(с ограничивающими рамками или без них). ' 
-                            ' При воспроизведении видео визуализация будет отображаться в зависимости от текущего времени.'
-                        ),
-                        html.Button("Описание", id="learn-more-button", n_clicks=0)
-                    ]
-                ),
-                html.Div(
-                    className='video-outer-container',
-                    children=html.Div(
-                        style={'width': '100%', 'paddingBottom': '56.25%', 'position': 'relative'},
-                        children=player.DashPlayer(
-                            id='video-display',
-                            style={'position': 'absolute', 'width': '100%',
-                                   'height': '100%', 'top': '0', 'left': '0', 'bottom': '0', 'right': '0'},
-                            url='https://www.youtube.com/watch?v=gPtn6hD7o8g',
-                            controls=True,
-                            playing=False,
-                            volume=1,
-                            width='100%',
-                            height='100%'
-                        )
-                    )
-                ),
-                html.Div(
-                    className='control-section',
-                    children=[
-                        html.Div(
-                            className='control-element',
-                            children=[
-                                html.Div(children=["Доверительный порог:"], style={'width': '40%'}),
-                                html.Div(dcc.Slider(
-                                    id='slider-minimum-confidence-threshold',
-                                    min=20,
-                                    max=80,
-                                    marks={i: f'{i}%' for i in range(20, 81, 10)},
-                                    value=30,
-                                    updatemode='drag'
-                                ), style={'width': '60%'})
-                            ]
-                        ),
-
-                        html.Div(
-                            className='control-element',
-                            children=[
-                                html.Div(children=["Выбор видео:"], style={'width': '40%'}),
-                                dcc.Dropdown(
-                                    id="dropdown-footage-selection",
-                                    options=[
-                                        {'label': 'Склад1_каски_перчатки',
-                                         'value': '24.mp4'},
-                                        {'label': 'Склад2_каски_перчатки',
-                                         'value': 'video2.mp4'},
-                                        {'label': 'Склад3_каски_перчатки',
-                                         'value': 'video3.mp4'},
-                                        {'label': 'Склад4_каски_перчатки',
-                                         'value': 'video4.mp4'},
-                                    ],
-                                    value='24.mp4',
-                                    clearable=False,
-                                    style={'width': '60%'}
-                                )
-                            ]
-                        ),
-
-                        html.Div(
-                            className='control-element',
-                            children=[
-                                html.Div(children=["Режим воспроизведения:"], style={'width': '40%'}),
-                                dcc.Dropdown(
-                                    id="dropdown-video-display-mode",
-                                    options=[
-                                        {'label': 'Обычный', 'value': 'regular'},
-                                        {'label': 'Рамочный', 'value': 'bounding_box'},
-                                    ],
-                                    value='bounding_box',
-                                    searchable=False,
-                                    clearable=False,
-                                    style={'width': '60%'}
-                                )
-                            ]
-                        ),
-
-                        html.Div(
-                           className='control-element',
+def serve_layout():
+    """Return the layout of the app. It is served on every page load, so the footage dropdown lists the footages
+    of the catalog at that time."""
+    return html.Div(
+        children=[
+            html.Div(
+                id='top-bar',
+                className='row',
+                style={'backgroundColor': '#fa4f56',
+                       'height': '5px',
+                       }
+            ),
+            html.Div(
+                className='container',
+                children=[
+            html.Div(
+                id='left-side-column',
+                className='eight columns',
+                style={'display': 'flex',
+                       'flexDirection': 'column',
+                       'flex': 1,
+                       'height': 'calc(100vh - 5px)',
+                       'backgroundColor': '#F2F2F2',
+                       'overflow-y': 'scroll',
+                       'marginLeft': '0px',
+                       'justifyContent': 'flex-start',
+                       'alignItems': 'center'},
+                children=[
+                    html.Div(
+                        id='header-section',
+                        children=[
+                            html.H4(
+                                'Детектирование объектов ГПН'
+                            ),
+                            html.P(
+                                'Выберите видеоролик для просмотра и режим отображения(с ограничивающими рамками или без них). ' 
+                                ' При воспроизведении видео визуализация будет отображаться в зависимости от текущего времени.'
+                            ),
+                            html.Button("Описание", id="learn-more-button", n_clicks=0)
+                        ]
+                    ),
+                    html.Div(
+                        className='video-outer-container',
+                        children=html.Div(
+                            style={'width': '100%', 'paddingBottom': '56.25%', 'position': 'relative'},
                             children=[
-                               html.Div(children=["Режим просмотра"], style={'width': '40%'}),
-                               dcc.Dropdown(
-                                   id="dropdown-graph-view-mode",
-                                   options=[
-                                       {'label': 'Визуальный', 'value': 'visual'},
-                                       {'label': 'Тестируемый', 'value': 'detection'}
-                                   ],
-                                   value='visual',
-                                   searchable=False,
-                                   clearable=False,
-                                   style={'width': '60%'}
-                              )
+                                player.DashPlayer(
+                                    id='video-display',
+                                    style={'position': 'absolute', 'width': '100%',
+                                           'height': '100%', 'top': '0', 'left': '0', 'bottom': '0', 'right': '0'},
+                                    url='https://www.youtube.com/watch?v=gPtn6hD7o8g',
+                                    controls=True,
+                                    playing=False,
+                                    volume=1,
+                                    width='100%',
+                                    height='100%'
+                                ),
+                                # The boxes of the current frame, drawn over the video. The clicks go through to
+                                # the player
+                                dcc.Graph(
+                                    id='graph-box-overlay',
+                                    style={'position': 'absolute', 'width': '100%', 'height': '100%', 'top': '0',
+                                           'left': '0', 'pointerEvents': 'none'},
+                                    config={'staticPlot': True},
+                                    figure=go.Figure(layout=OVERLAY_LAYOUT)
+                                ),
+                                # The frame at the current time of the player, only updated (in the browser) when
+                                # the frame changes, and the frame rate of the footage it is computed with
+                                dcc.Store(id='store-current-frame'),
+                                dcc.Store(id='store-footage-fps'),
+                                # The data the figures are assembled from in the browser: the layouts, the footage
+                                # (with all its detections if CLIENTSIDE_FIGURES), the current frame and its boxes
+                                dcc.Store(id='store-figure-styles', data=FIGURE_STYLES),
+                                dcc.Store(id='store-footage-payload'),
+                                dcc.Store(id='store-frame-data'),
+                                dcc.Store(id='store-frame-boxes'),
+                                dcc.Store(id='store-timeline'),
+                                # The frame the boxes are requested for (without CLIENTSIDE_FIGURES), none
+                                # outside of the bounding box mode
+                                dcc.Store(id='store-box-frame'),
+                                # The (footage, frame, threshold) of the data sent last to the session
+                                dcc.Store(id='store-frame-data-key'),
+                                dcc.Store(id='store-frame-boxes-key')
                             ]
                         )
-                    ]
-                )
-            ]
-        ),
-        html.Div(
-            id='right-side-column',
-            className='four columns',
-            style={
-                'height': 'calc(100vh - 5px)',
-                'overflow-y': 'scroll',
-                'marginLeft': '1%',
-                'display': 'flex',
-                'backgroundColor': '#F9F9F9',
-                'flexDirection': 'column'
-            },
-            children=[
+                    ),
+                    html.Div(
+                        className='video-outer-container',
+                        children=[
+                            html.P(children="Объекты на протяжении видео", className='plot-title'),
+                            # Clicking on the timeline seeks the video to that time
+                            dcc.Graph(
+                                id='graph-timeline',
+                                style={'height': '25vh', 'width': '100%'},
+                                config={'displayModeBar': False}
+                            )
+                        ]
+                    ),
+                    html.Div(
+                        className='control-section',
+                        children=[
+                            html.Div(
+                                className='control-element',
+                                children=[
+                                    html.Div(children=["Доверительный порог:"], style={'width': '40%'}),
+                                    html.Div(dcc.Slider(
+                                        id='slider-minimum-confidence-threshold',
+                                        min=20,
+                                        max=80,
+                                        marks={i: f'{i}%' for i in range(20, 81, 10)},
+                                        value=30,
+                                        updatemode='drag'
+                                    ), style={'width': '60%'})
+                                ]
+                            ),
+
+                            html.Div(
+                                className='control-element',
+                                children=[
+                                    html.Div(children=["Выбор видео:"], style={'width': '40%'}),
+                                    dcc.Dropdown(
+                                        id="dropdown-footage-selection",
+                                        options=footage_catalog.dropdown_options(),
+                                        value=next(iter(footage_catalog), None),
+                                        clearable=False,
+                                        style={'width': '60%'}
+                                    )
+                                ]
+                            ),
+
+                            html.Div(
+                                className='control-element',
+                                children=[
+                                    html.Div(children=["Режим воспроизведения:"], style={'width': '40%'}),
+                                    dcc.Dropdown(
+                                        id="dropdown-video-display-mode",
+                                        options=[
+                                            {'label': 'Обычный', 'value': 'regular'},
+                                            {'label': 'Рамочный', 'value': 'bounding_box'},
+                                        ],
+                                        value='bounding_box',
+                                        searchable=False,
+                                        clearable=False,
+                                        style={'width': '60%'}
+                                    )
+                                ]
+                            ),
+
+                            html.Div(
+                               className='control-element',
+                                children=[
+                                   html.Div(children=["Режим просмотра"], style={'width': '40%'}),
+                                   dcc.Dropdown(
+                                       id="dropdown-graph-view-mode",
+                                       options=[
+                                           {'label': 'Визуальный', 'value': 'visual'},
+                                           {'label': 'Тестируемый', 'value': 'detection'}
+                                       ],
+                                       value='visual',
+                                       searchable=False,
+                                       clearable=False,
+                                       style={'width': '60%'}
+                                  )
+                                ]
+                            )
+                        ]
+                    )
+                ]
+            ),
+            html.Div(
+                id='right-side-column',
+                className='four columns',
+                style={
+                    'height': 'calc(100vh - 5px)',
+                    'overflow-y': 'scroll',
+                    'marginLeft': '1%',
+                    'display': 'flex',
+                    'backgroundColor': '#F9F9F9',
+                    'flexDirection': 'column'
+                },
+                children=[
                 
-                html.Div(id="div-visual-mode"),
-                html.Div(id="div-detection-mode")
-            ]
-        )]),
-        markdown_popup()
-    ]
-)
-
+                    html.Div(id="div-visual-mode"),
+                    html.Div(id="div-detection-mode")
+                ]
+            )]),
+            markdown_popup()
+        ]
+    )
 
-# Data Loading
-@app.server.before_first_request
-def load_all_footage():
-    global data_dict, url_dict
 
-    # Load the dictionary containing all the variables needed for analysis
-    data_dict = {
-        '24.mp4': load_data('http://13.94.234.202:8765/data/csv/24.csv'),
-        'video2.mp4': load_data('http://13.94.234.202:8765/data/csv/video2.csv'),
-        'video3.mp4': load_data('http://13.94.234.202:8765/data/csv/video3.csv'),
-        'video4.mp4': load_data('http://13.94.234.202:8765/data/csv/video4.csv')
-    }
 
-    url_dict = {
-        'regular': {
-            '24.mp4': 'http://13.94.234.202:8765/data/videos/24.mp4',
-            'video2.mp4': 'http://13.94.234.202:8765/data/videos/video2.mp4',
-            'video3.mp4': 'http://13.94.234.202:8765/data/videos/video3.mp4',
-            'video4.mp4': 'http://13.94.234.202:8765/data/videos/video4.mp4'
-        },
-
-        'bounding_box': {
-            '24.mp4': 'http://13.94.234.202:8765/data/detection/24_converted.mp4',
-            'video2.mp4': 'http://13.94.234.202:8765/data/detection/video2_converted.mp4',
-            'video3.mp4': 'http://13.94.234.202:8765/data/detection/video3_converted.mp4',
-            'video4.mp4': 'http://13.94.234.202:8765/data/detection/video4_converted.mp4'
-        }
-    }
+app.layout = serve_layout
 
 
 # Footage Selection
 @app.callback(Output("video-display", "url"),
-              [Input('dropdown-footage-selection', 'value'),
-               Input('dropdown-video-display-mode', 'value')])
-def select_footage(footage, display_mode):
+              [Input('dropdown-footage-selection', 'value')])
+def select_footage(footage):
     # Find desired footage and update player video
-    url = url_dict[display_mode][footage]
+    url = footage_catalog.video_url(footage)
     return url
 
 
+@app.callback(Output("store-footage-fps", "data"),
+              [Input('dropdown-footage-selection', 'value')])
+def select_footage_fps(footage):
+    return get_footage_fps(footage)
+
+
+# The figures are updated when the frame changes, instead of polling the current time of the player. The frame is
+# computed in the browser on every update of the current time, and only changes the store when it's a new frame (so
+# a paused player triggers no request)
+app.clientside_callback(
+    ClientsideFunction(namespace='player', function_name='currentFrame'),
+    Output('store-current-frame', 'data'),
+    [Input('video-display', 'currentTime'),
+     Input('store-footage-fps', 'data')],
+    [State('store-current-frame', 'data')]
+)
+
+
 # Learn more popup
 @app.callback(Output("markdown", "style"),
               [Input("learn-more-button", "n_clicks"), Input("markdown_close", "n_clicks")])
@@ -317,11 +659,6 @@ def update_click_output(button_click, close_click):
 def update_output(dropdown_value):
     if dropdown_value == "visual":
         return [
-            dcc.Interval(
-                id="interval-visual-mode",
-                interval=700,
-                n_intervals=0
-            ),
             html.Div(
                 children=[
                     html.P(children="Категория обнаруженных объектов",
@@ -373,252 +710,176 @@ def update_output(dropdown_value):
 #       return []
 
 
-# Updating Figures
-@app.callback(Output("bar-score-graph", "figure"),
-              [Input("interval-visual-mode", "n_intervals")],
-              [State("video-display", "currentTime"),
-               State('dropdown-footage-selection', 'value'),
-               State('slider-minimum-confidence-threshold', 'value')])
-def update_score_bar(n, current_time, footage, threshold):
-    layout = go.Layout(
-        showlegend=False,
-        paper_bgcolor='rgb(249,249,249)',
-        plot_bgcolor='rgb(249,249,249)',
-        xaxis={
-            'automargin': True,
-        },
-        yaxis={
-            'title': 'Score',
-            'automargin': True,
-            'range': [0, 1]
-        }
-    )
+# Data of the Frames
+def build_frame_data(footage, frame, threshold):
+    """Build the aggregates of the frame at the given threshold (in percent) the figures are assembled from in the
+    browser, see get_frame_aggregates."""
+    frame_aggregates = get_frame_aggregates(get_footage_data(footage)["tiles"], frame, threshold)
 
-    if current_time is not None:
-        current_frame = round(current_time * FRAMERATE)
-
-        if n > 0 and current_frame > 0:
-            video_info_df = data_dict[footage]["video_info_df"]
-
-            # Select the subset of the dataset that correspond to the current frame
-            frame_df = video_info_df[video_info_df["frame"] == current_frame]
-
-            # Select only the frames above the threshold
-            threshold_dec = threshold / 100  # Threshold in decimal
-            frame_df = frame_df[frame_df["score"] > threshold_dec]
-
-            # Select up to 8 frames with the highest scores
-            frame_df = frame_df[:min(8, frame_df.shape[0])]
-
-            # Add count to object names (e.g. person --> person 1, person --> person 2)
-            objects = frame_df["class_str"].tolist()
-            object_count_dict = {x: 0 for x in set(objects)}  # Keeps count of the objects
-            objects_wc = []  # Object renamed with counts
-            for object in objects:
-                object_count_dict[object] += 1  # Increment count
-                objects_wc.append(f"{object} {object_count_dict[object]}")
-
-            colors = list('rgb(250,79,86)' for i in range(len(objects_wc)))
-
-            # Add text information
-            y_text = [f"{round(value * 100)}% confidence" for value in frame_df["score"].tolist()]
-
-            figure = go.Figure({
-                'data': [{'hoverinfo': 'x+text',
-                          'name': 'Detection Scores',
-                          'text': y_text,
-                          'type': 'bar',
-                          'x': objects_wc,
-                          'marker': {'color': colors},
-                          'y': frame_df["score"].tolist()}],
-                'layout': {'showlegend': False,
-                           'autosize': False,
-                           'paper_bgcolor': 'rgb(249,249,249)',
-                           'plot_bgcolor': 'rgb(249,249,249)',
-                           'xaxis': {'automargin': True, 'tickangle': -45},
-                           'yaxis': {'automargin': True, 'range': [0, 1], 'title': {'text': 'Score'}}}
-                }
-            )
-            return figure
-
-    return go.Figure(data=[go.Bar()], layout=layout)  # Returns empty bar
-
-
-@app.callback(Output("pie-object-count", "figure"),
-              [Input("interval-visual-mode", "n_intervals")],
-              [State("video-display", "currentTime"),
-               State('dropdown-footage-selection', 'value'),
-               State('slider-minimum-confidence-threshold', 'value')])
-def update_object_count_pie(n, current_time, footage, threshold):
-    layout = go.Layout(
-        showlegend=False,
-        paper_bgcolor='rgb(249,249,249)',
-        plot_bgcolor='rgb(249,249,249)',
-        autosize=False,
-        margin=go.layout.Margin(
-            l=10,
-            r=10,
-            t=15,
-            b=15
-        )
-    )
+    return {
+        "footage": footage,
+        "top_classes": frame_aggregates["top_classes"].tolist(),
+        "top_scores": np.round(frame_aggregates["top_scores"].astype(float), 4).tolist(),
+        "class_codes": frame_aggregates["class_codes"].tolist(),
+        "class_counts": frame_aggregates["class_counts"].tolist(),
+        "class_max": np.round(frame_aggregates["class_max"].astype(float), 4).tolist()
+    }
 
-    if current_time is not None:
-        current_frame = round(current_time * FRAMERATE)
 
-        if n > 0 and current_frame > 0:
-            video_info_df = data_dict[footage]["video_info_df"]
+def build_frame_boxes(footage, frame, threshold):
+    """Build the boxes detected above the threshold (in percent) at the given frame, as (x, y, right, bottom)
+    normalized coordinates, and their label. The overlay drawing them is assembled in the browser."""
+    frame_df = get_frame_df(footage, frame)
+    frame_df = frame_df[frame_df["score"] > threshold / 100]
 
-            # Select the subset of the dataset that correspond to the current frame
-            frame_df = video_info_df[video_info_df["frame"] == current_frame]
+    boxes = np.round(frame_df[["x", "y", "right", "bottom"]].values.astype(float), 4)
+    labels = [f"{class_str}: {round(score * 100)}%"
+              for class_str, score in zip(frame_df["class_str"], frame_df["score"])]
+    return {"boxes": boxes.tolist(), "labels": labels}
 
-            # Select only the frames above the threshold
-            threshold_dec = threshold / 100  # Threshold in decimal
-            frame_df = frame_df[frame_df["score"] > threshold_dec]
 
-            # Get the count of each object class
-            class_counts = frame_df["class_str"].value_counts()
+# Updating Figures
+if CLIENTSIDE_FIGURES:
+    # The payload of a footage is sent once when it's selected, the browser then aggregates every frame
+    @app.callback(Output("store-footage-payload", "data"),
+                  [Input('dropdown-footage-selection', 'value')])
+    def select_footage_payload(footage):
+        footage_data = get_footage_data(footage)
+        if "payload" not in footage_data:
+            footage_data["payload"] = build_footage_payload(footage)
+        return footage_data["payload"]
+
+    for graph_id, function_name in (("bar-score-graph", "scoreBar"),
+                                    ("pie-object-count", "objectCountPie"),
+                                    ("heatmap-confidence", "confidenceHeatmap")):
+        app.clientside_callback(
+            ClientsideFunction(namespace='figures', function_name=function_name),
+            Output(graph_id, "figure"),
+            [Input("store-current-frame", "data"),
+             Input("store-footage-payload", "data"),
+             Input('slider-minimum-confidence-threshold', 'value')],
+            [State("store-figure-styles", "data"),
+             State(graph_id, "figure")]
+        )
 
-            classes = class_counts.index.tolist()  # List of each class
-            counts = class_counts.tolist()  # List of each count
+    # The boxes drawn over the video are read from the payload too
+    app.clientside_callback(
+        ClientsideFunction(namespace='figures', function_name='boxOverlay'),
+        Output("graph-box-overlay", "figure"),
+        [Input("store-current-frame", "data"),
+         Input("store-footage-payload", "data"),
+         Input('dropdown-video-display-mode', 'value'),
+         Input('slider-minimum-confidence-threshold', 'value')],
+        [State("store-figure-styles", "data"),
+         State("graph-box-overlay", "figure")]
+    )
+else:
+    # The metadata of a footage is sent once when it's selected, then only the aggregates of every frame
+    @app.callback(Output("store-footage-payload", "data"),
+                  [Input('dropdown-footage-selection', 'value')])
+    def select_footage_meta(footage):
+        return build_footage_meta(footage)
+
+    @app.callback([Output("store-frame-data", "data"),
+                   Output("store-frame-data-key", "data")],
+                  [Input("store-current-frame", "data"),
+                   Input('dropdown-footage-selection', 'value'),
+                   Input('slider-minimum-confidence-threshold', 'value')],
+                  [State("store-frame-data-key", "data")])
+    def update_frame_data(frame, footage, threshold, last_key):
+        # The frame and threshold filters are shared by the three figures, so they are only done once per frame
+        current_frame = resolve_frame(footage, frame) if frame is not None else None
+        if current_frame is not None and current_frame <= 0:
+            current_frame = None
+
+        # Nothing is sent while the session keeps displaying the same frame (e.g. a frame snapped to)
+        key = [footage, current_frame, int(threshold)]
+        if key == last_key:
+            raise PreventUpdate
+
+        if current_frame is None:
+            return None, key
+
+        # Many viewers watch the same frames, so the aggregates are only computed on a cache miss
+        cache_key = (footage, current_frame, int(threshold))
+        return figure_cache.get_or_compute(
+            cache_key, lambda: build_frame_data(footage, current_frame, threshold)
+        ), key
+
+    for graph_id, function_name in (("bar-score-graph", "scoreBarFromData"),
+                                    ("pie-object-count", "objectCountPieFromData"),
+                                    ("heatmap-confidence", "confidenceHeatmapFromData")):
+        app.clientside_callback(
+            ClientsideFunction(namespace='figures', function_name=function_name),
+            Output(graph_id, "figure"),
+            [Input("store-frame-data", "data"),
+             Input("store-footage-payload", "data")],
+            [State("store-figure-styles", "data")]
+        )
 
-            text = [f"{count} detected" for count in counts]
 
-            # Set colorscale to piechart
-            colorscale = ['#fa4f56', '#fe6767', '#ff7c79', '#ff908b', '#ffa39d', '#ffb6b0', '#ffc8c3', '#ffdbd7',
-                          '#ffedeb', '#ffffff']
+    # The frame the boxes are requested for only follows the current frame in bounding box mode
+    app.clientside_callback(
+        ClientsideFunction(namespace='player', function_name='boxFrame'),
+        Output("store-box-frame", "data"),
+        [Input("store-current-frame", "data"),
+         Input('dropdown-video-display-mode', 'value')],
+        [State("store-box-frame", "data")]
+    )
 
-            pie = go.Pie(
-                labels=classes,
-                values=counts,
-                text=text,
-                hoverinfo="text+percent",
-                textinfo="label+percent",
-                marker={'colors': colorscale[:len(classes)]}
-            )
-            return go.Figure(data=[pie], layout=layout)
-
-    return go.Figure(data=[go.Pie()], layout=layout)  # Returns empty pie chart
-
-
-@app.callback(Output("heatmap-confidence", "figure"),
-              [Input("interval-visual-mode", "n_intervals")],
-              [State("video-display", "currentTime"),
-               State('dropdown-footage-selection', 'value'),
-               State('slider-minimum-confidence-threshold', 'value')])
-def update_heatmap_confidence(n, current_time, footage, threshold):
-    layout = go.Layout(
-        showlegend=False,
-        paper_bgcolor='rgb(249,249,249)',
-        plot_bgcolor='rgb(249,249,249)',
-        autosize=False,
-        margin=go.layout.Margin(
-            l=10,
-            r=10,
-            b=20,
-            t=20,
-            pad=4
-        )
+    @app.callback([Output("store-frame-boxes", "data"),
+                   Output("store-frame-boxes-key", "data")],
+                  [Input("store-box-frame", "data"),
+                   Input('dropdown-footage-selection', 'value'),
+                   Input('slider-minimum-confidence-threshold', 'value')],
+                  [State("store-frame-boxes-key", "data")])
+    def update_frame_boxes(frame, footage, threshold, last_key):
+        # The boxes are drawn from the detections of the frame, instead of a second video with the boxes burnt in
+        current_frame = resolve_frame(footage, frame) if frame is not None else None
+
+        # Nothing is sent while the session keeps displaying the same frame
+        key = [footage, current_frame, int(threshold)]
+        if key == last_key:
+            raise PreventUpdate
+
+        if current_frame is None:
+            return None, key
+
+        cache_key = ("boxes", footage, current_frame, int(threshold))
+        return figure_cache.get_or_compute(
+            cache_key, lambda: build_frame_boxes(footage, current_frame, threshold)
+        ), key
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='figures', function_name='boxOverlayFromData'),
+        Output("graph-box-overlay", "figure"),
+        [Input("store-frame-boxes", "data")],
+        [State("store-figure-styles", "data")]
     )
 
-    if current_time is not None:
-        current_frame = round(current_time * FRAMERATE)
-
-        if n > 0 and current_frame > 0:
-            # Load variables from the data dictionary
-            video_info_df = data_dict[footage]["video_info_df"]
-            classes_padded = data_dict[footage]["classes_padded"]
-            root_round = data_dict[footage]["root_round"]
-            classes_matrix = data_dict[footage]["classes_matrix"]
-
-            # Select the subset of the dataset that correspond to the current frame
-            frame_df = video_info_df[video_info_df["frame"] == current_frame]
-
-            # Select only the frames above the threshold
-            threshold_dec = threshold / 100
-            frame_df = frame_df[frame_df["score"] > threshold_dec]
-
-            # Remove duplicate, keep the top result
-            frame_no_dup = frame_df[["class_str", "score"]].drop_duplicates("class_str")
-            frame_no_dup.set_index("class_str", inplace=True)
-
-            # The list of scores
-            score_list = []
-            for el in classes_padded:
-                if el in frame_no_dup.index.values:
-                    score_list.append(frame_no_dup.loc[el][0])
-                else:
-                    score_list.append(0)
-
-            # Generate the score matrix, and flip it for visual
-            score_matrix = np.reshape(score_list, (-1, int(root_round)))
-            score_matrix = np.flip(score_matrix, axis=0)
-
-            # We set the color scale to white if there's nothing in the frame_no_dup
-            if frame_no_dup.shape != (0, 1):
-                colorscale = [[0, '#f9f9f9'], [1, '#fa4f56']]
-            else:
-                colorscale = [[0, '#f9f9f9'], [1, '#f9f9f9']]
-
-            hover_text = [f"{score * 100:.2f}% confidence" for score in score_list]
-            hover_text = np.reshape(hover_text, (-1, int(root_round)))
-            hover_text = np.flip(hover_text, axis=0)
-
-            # Add linebreak for multi-word annotation
-            classes_matrix = classes_matrix.astype(dtype='|U40')
-
-            for index, row in enumerate(classes_matrix):
-                row = list(map(lambda x: '<br>'.join(x.split()), row))
-                classes_matrix[index] = row
-
-            # Set up annotation text
-            annotation = []
-            for y_cord in range(int(root_round)):
-                for x_cord in range(int(root_round)):
-                    annotation_dict = dict(
-                        showarrow=False,
-                        text=classes_matrix[y_cord][x_cord],
-                        xref='x',
-                        yref='y',
-                        x=x_cord,
-                        y=y_cord
-                    )
-                    if score_matrix[y_cord][x_cord] > 0:
-                        annotation_dict['font'] = {'color': '#F9F9F9', 'size': '11'}
-                    else:
-                        annotation_dict['font'] = {'color': '#606060', 'size': '11'}
-                    annotation.append(annotation_dict)
-
-            # Generate heatmap figure
-
-            figure = {
-                'data': [
-                    {'colorscale': colorscale,
-                     'showscale': False,
-                     'hoverinfo': 'text',
-                     'text': hover_text,
-                     'type': 'heatmap',
-                     'zmin': 0,
-                     'zmax': 1,
-                     'xgap': 1,
-                     'ygap': 1,
-                     'z': score_matrix}],
-                'layout':
-                    {'showlegend': False,
-                     'autosize': False,
-                     'paper_bgcolor': 'rgb(249,249,249)',
-                     'plot_bgcolor': 'rgb(249,249,249)',
-                     'margin': {'l': 10, 'r': 10, 'b': 20, 't': 20, 'pad': 2},
-                     'annotations': annotation,
-                     'xaxis': {'showticklabels': False, 'showgrid': False, 'side': 'top', 'ticks': ''},
-                     'yaxis': {'showticklabels': False, 'showgrid': False, 'side': 'left', 'ticks': ''}
-                     }
-            }
-
-            return figure
-
-    # Returns empty figure
-    return go.Figure(data=[go.Pie()], layout=layout)
+
+# Timeline
+@app.callback(Output("store-timeline", "data"),
+              [Input('dropdown-footage-selection', 'value'),
+               Input('slider-minimum-confidence-threshold', 'value')])
+def update_timeline(footage, threshold):
+    cache_key = ("timeline", footage, int(threshold))
+    return figure_cache.get_or_compute(cache_key, lambda: build_timeline_data(footage, threshold))
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='figures', function_name='timeline'),
+    Output("graph-timeline", "figure"),
+    [Input("store-timeline", "data")],
+    [State("store-figure-styles", "data")]
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='player', function_name='seekTo'),
+    Output("video-display", "seekTo"),
+    [Input("graph-timeline", "clickData")],
+    [State("video-display", "duration")]
+)
 
 
 # Running the server
@@ -0,0 +1,400 @@
+/* Callbacks run in the browser, see app.clientside_callback in app.py
+–––––––––––––––––––––––––––––––––––––––––––––––––– */
+
+// The typed arrays of the last footage payload, and the aggregates of the last frame (shared by the three figures)
+var decodedPayload = null;
+var decodedArrays = null;
+var lastAggregatesKey = null;
+var lastAggregates = null;
+// The (footage, resolved frame, threshold) of the last aggregates, stored in the layout of the figures rendered from
+// them (as its datarevision), so a figure is not rendered again while the resolved frame doesn't change
+var lastRenderKey = null;
+
+var ARRAY_TYPES = {i2: Int16Array, i4: Int32Array, f4: Float32Array};
+
+// Decode an array encoded by encode_array in app.py
+function decodeArray(encoded) {
+    var bytes = atob(encoded.data);
+    var buffer = new Uint8Array(bytes.length);
+    for (var i = 0; i < bytes.length; i++) {
+        buffer[i] = bytes.charCodeAt(i);
+    }
+    return new ARRAY_TYPES[encoded.dtype](buffer.buffer);
+}
+
+function getArrays(payload) {
+    if (payload !== decodedPayload) {
+        decodedArrays = {
+            frameOffsets: decodeArray(payload.frame_offsets),
+            classCodes: decodeArray(payload.class_codes),
+            scores: decodeArray(payload.scores),
+            boxes: decodeArray(payload.boxes)
+        };
+        decodedPayload = payload;
+    }
+    return decodedArrays;
+}
+
+// Same as resolve_frame in app.py: snap the frame to the nearest frame with detections within snap_window (see
+// get_snap_window), returns null past the end
+function resolveFrame(payload, arrays, frame) {
+    var offsets = arrays.frameOffsets;
+    var nFrames = offsets.length - 1;
+    if (frame > payload.frame_count || offsets[nFrames] === 0) {
+        return null;
+    }
+
+    function hasDetections(f) {
+        return f >= 0 && f < nFrames && offsets[f + 1] > offsets[f];
+    }
+
+    if (hasDetections(frame)) {
+        return frame;
+    }
+    var snapBefore = payload.snap_window[0], snapAfter = payload.snap_window[1];
+    for (var distance = 1; distance <= Math.max(snapBefore, snapAfter); distance++) {
+        if (distance <= snapBefore && hasDetections(frame - distance)) {
+            return frame - distance;
+        }
+        if (distance <= snapAfter && hasDetections(frame + distance)) {
+            return frame + distance;
+        }
+    }
+    return frame;
+}
+
+// Same as get_frame_aggregates in utils/frame_tiles.py (see build_frame_data in app.py), from the detections
+// of the frame
+function frameAggregates(payload, arrays, frame, threshold) {
+    var offsets = arrays.frameOffsets;
+    var start = 0, stop = 0;
+    if (frame >= 0 && frame < offsets.length - 1) {
+        start = offsets[frame];
+        stop = offsets[frame + 1];
+    }
+
+    var top = [];
+    var counts = {};
+    var maxScores = {};
+    for (var row = start; row < stop; row++) {
+        var score = arrays.scores[row];
+        if (score > threshold / 100) {
+            var code = arrays.classCodes[row];
+            top.push({code: code, score: score});
+            counts[code] = (counts[code] || 0) + 1;
+            maxScores[code] = Math.max(maxScores[code] || 0, score);
+        }
+    }
+    top.sort(function (a, b) { return b.score - a.score; });
+    top = top.slice(0, 8);
+
+    // Ordered by decreasing count, then by class code
+    var classCodes = Object.keys(counts).map(Number);
+    classCodes.sort(function (a, b) { return (counts[b] - counts[a]) || (a - b); });
+
+    return {
+        footage: payload.footage,
+        top_classes: top.map(function (item) { return item.code; }),
+        top_scores: top.map(function (item) { return item.score; }),
+        class_codes: classCodes,
+        class_counts: classCodes.map(function (code) { return counts[code]; }),
+        class_max: classCodes.map(function (code) { return maxScores[code]; })
+    };
+}
+
+// Same as build_frame_boxes in app.py: the boxes detected above the threshold at the given frame, as (x, y, right,
+// bottom) normalized coordinates, and their label
+function frameBoxes(payload, arrays, frame, threshold) {
+    var offsets = arrays.frameOffsets;
+    var boxes = [];
+    var labels = [];
+    if (frame >= 0 && frame < offsets.length - 1) {
+        for (var row = offsets[frame]; row < offsets[frame + 1]; row++) {
+            var score = arrays.scores[row];
+            if (score > threshold / 100) {
+                var box = arrays.boxes.subarray(row * 4, row * 4 + 4);
+                boxes.push(Array.prototype.map.call(box, function (value) { return Math.round(value * 1e4) / 1e4; }));
+                labels.push(payload.classes[arrays.classCodes[row]] + ': ' + Math.round(score * 100) + '%');
+            }
+        }
+    }
+    return {boxes: boxes, labels: labels};
+}
+
+// The aggregates of the frame at the current time, or null if there is no frame to visualize
+function getAggregates(frame, payload, threshold) {
+    if (frame === null || frame === undefined || !payload) {
+        lastRenderKey = null;
+        return null;
+    }
+
+    var key = payload.footage + '/' + frame + '/' + threshold;
+    if (payload !== decodedPayload || key !== lastAggregatesKey) {
+        var arrays = getArrays(payload);
+        var currentFrame = resolveFrame(payload, arrays, frame);
+        lastAggregates = currentFrame !== null && currentFrame > 0 ?
+            frameAggregates(payload, arrays, currentFrame, threshold) : null;
+        lastAggregatesKey = key;
+        lastRenderKey = payload.footage + '/' + (lastAggregates ? currentFrame : null) + '/' + threshold;
+    }
+    return lastAggregates;
+}
+
+// Render a figure from the aggregates of the frame at the current time, unless the figure already shows them
+function renderOnce(figure, frame, payload, threshold, styles, currentFigure) {
+    var aggregates = getAggregates(frame, payload, threshold);
+    if (lastRenderKey !== null && currentFigure && currentFigure.layout &&
+            currentFigure.layout.datarevision === lastRenderKey) {
+        return window.dash_clientside.no_update;
+    }
+
+    var rendered = figure(aggregates, payload, styles);
+    rendered.layout = Object.assign({}, rendered.layout, {datarevision: lastRenderKey});
+    return rendered;
+}
+
+// The overlay drawing the boxes of a frame over the video
+function boxOverlayFigure(boxes, styles) {
+    var shapes = [];
+    var annotations = [];
+    if (boxes) {
+        boxes.boxes.forEach(function (box, index) {
+            shapes.push({
+                type: 'rect', xref: 'x', yref: 'y', x0: box[0], y0: box[1], x1: box[2], y1: box[3],
+                line: {color: styles.box_color, width: 2}
+            });
+            annotations.push({
+                x: box[0], y: box[1], xanchor: 'left', yanchor: 'bottom', showarrow: false,
+                text: boxes.labels[index], bgcolor: styles.box_color,
+                font: {color: '#F9F9F9', size: 11}
+            });
+        });
+    }
+
+    return {
+        data: [],
+        layout: Object.assign({}, styles.layouts.overlay, {shapes: shapes, annotations: annotations})
+    };
+}
+
+// Wait for the metadata of the footage the aggregates of the frame belong to
+function fromFrameData(figure, frameData, footageMeta, styles) {
+    if (!footageMeta || (frameData && frameData.footage !== footageMeta.footage)) {
+        return window.dash_clientside.no_update;
+    }
+    return figure(frameData, footageMeta, styles);
+}
+
+// The bar chart of the scores of the (at most 8) most probable objects inside the frame
+function scoreBarFigure(aggregates, footage, styles) {
+    if (!aggregates) {
+        return {data: [{type: 'bar'}], layout: styles.layouts.empty_bar};
+    }
+
+    // Add count to object names (e.g. person --> person 1, person --> person 2)
+    var objectCounts = {};
+    var objects = aggregates.top_classes.map(function (code) {
+        var name = footage.classes[code];
+        objectCounts[name] = (objectCounts[name] || 0) + 1;
+        return name + ' ' + objectCounts[name];
+    });
+
+    return {
+        data: [{
+            hoverinfo: 'x+text',
+            name: 'Detection Scores',
+            text: aggregates.top_scores.map(function (score) { return Math.round(score * 100) + '% confidence'; }),
+            type: 'bar',
+            x: objects,
+            marker: {color: objects.map(function () { return 'rgb(250,79,86)'; })},
+            y: aggregates.top_scores
+        }],
+        layout: styles.layouts.bar
+    };
+}
+
+// The pie chart of the number of objects of each class inside the frame
+function objectCountPieFigure(aggregates, footage, styles) {
+    if (!aggregates) {
+        return {data: [{type: 'pie'}], layout: styles.layouts.pie};
+    }
+
+    return {
+        data: [{
+            type: 'pie',
+            labels: aggregates.class_codes.map(function (code) { return footage.classes[code]; }),
+            values: aggregates.class_counts,
+            text: aggregates.class_counts.map(function (count) { return count + ' detected'; }),
+            hoverinfo: 'text+percent',
+            textinfo: 'label+percent',
+            marker: {colors: styles.pie_colors.slice(0, aggregates.class_codes.length)}
+        }],
+        layout: styles.layouts.pie
+    };
+}
+
+// The heatmap of the highest score of each class of the footage inside the frame
+function confidenceHeatmapFigure(aggregates, footage, styles) {
+    if (!aggregates) {
+        return {data: [{type: 'pie'}], layout: styles.layouts.empty_heatmap};
+    }
+
+    // Scatter the top score of each class detected in the frame into its cell
+    var root = footage.root;
+    var cellScores = new Array(root * root).fill(0);
+    aggregates.class_codes.forEach(function (code, index) {
+        var cell = footage.class_cells[code];
+        cellScores[cell] = Math.max(cellScores[cell], aggregates.class_max[index]);
+    });
+
+    var z = [];
+    var hoverText = [];
+    for (var row = 0; row < root; row++) {
+        var rowScores = cellScores.slice(row * root, (row + 1) * root);
+        z.push(rowScores);
+        hoverText.push(rowScores.map(function (score) { return (score * 100).toFixed(2) + '% confidence'; }));
+    }
+
+    var annotations = footage.cell_labels.map(function (label, cell) {
+        return {
+            showarrow: false, text: label, xref: 'x', yref: 'y', x: cell % root, y: Math.floor(cell / root),
+            font: {color: cellScores[cell] > 0 ? '#F9F9F9' : '#606060', size: '11'}
+        };
+    });
+
+    // The color scale is white if there's nothing detected in the frame
+    var colorscale = aggregates.class_codes.length > 0 ?
+        [[0, '#f9f9f9'], [1, '#fa4f56']] : [[0, '#f9f9f9'], [1, '#f9f9f9']];
+
+    return {
+        data: [{
+            colorscale: colorscale,
+            showscale: false,
+            hoverinfo: 'text',
+            text: hoverText,
+            type: 'heatmap',
+            zmin: 0,
+            zmax: 1,
+            xgap: 1,
+            ygap: 1,
+            z: z
+        }],
+        layout: Object.assign({}, styles.layouts.heatmap, {annotations: annotations})
+    };
+}
+
+// The functions return window.dash_clientside.no_update to leave their output as it is, which the renderer defines
+// before each call since dash-renderer 1.2.0 (Dash 1.5.0). Older renderers would set the output to undefined
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    player: {
+        // Convert the current time of the player to a frame, and only update the store when the frame changes
+        currentFrame: function (currentTime, fps, currentFrame) {
+            if (currentTime === null || currentTime === undefined || !fps) {
+                return window.dash_clientside.no_update;
+            }
+
+            var frame = Math.round(currentTime * fps);
+            if (frame === currentFrame) {
+                return window.dash_clientside.no_update;
+            }
+            return frame;
+        },
+
+        // The frame the boxes are drawn for: the current frame in bounding box mode, otherwise none, so the boxes
+        // are only requested from the server while they are displayed
+        boxFrame: function (currentFrame, displayMode, boxFrame) {
+            var frame = displayMode === 'bounding_box' && currentFrame !== undefined ? currentFrame : null;
+            if (frame === boxFrame) {
+                return window.dash_clientside.no_update;
+            }
+            return frame;
+        },
+
+        // Seek the player to the time clicked on the timeline. The player reads a value strictly between 0 and 1
+        // as a fraction of the video, and any other as seconds, so the time is given as a fraction once the
+        // duration is known (the two ends are exact in seconds)
+        seekTo: function (clickData, duration) {
+            if (!clickData || clickData.points.length === 0 || !duration) {
+                return window.dash_clientside.no_update;
+            }
+
+            var fraction = clickData.points[0].x / duration;
+            if (fraction <= 0) {
+                return 0;
+            }
+            return fraction < 1 ? fraction : duration;
+        }
+    },
+
+    // The figures of a frame, from its aggregates computed in the browser (with CLIENTSIDE_FIGURES in app.py)
+    figures: {
+        scoreBar: function (frame, payload, threshold, styles, currentFigure) {
+            return renderOnce(scoreBarFigure, frame, payload, threshold, styles, currentFigure);
+        },
+        objectCountPie: function (frame, payload, threshold, styles, currentFigure) {
+            return renderOnce(objectCountPieFigure, frame, payload, threshold, styles, currentFigure);
+        },
+        confidenceHeatmap: function (frame, payload, threshold, styles, currentFigure) {
+            return renderOnce(confidenceHeatmapFigure, frame, payload, threshold, styles, currentFigure);
+        },
+
+        // The figures of a frame, from its aggregates sent by the server (see build_frame_data in app.py)
+        scoreBarFromData: function (frameData, footageMeta, styles) {
+            return fromFrameData(scoreBarFigure, frameData, footageMeta, styles);
+        },
+        objectCountPieFromData: function (frameData, footageMeta, styles) {
+            return fromFrameData(objectCountPieFigure, frameData, footageMeta, styles);
+        },
+        confidenceHeatmapFromData: function (frameData, footageMeta, styles) {
+            return fromFrameData(confidenceHeatmapFigure, frameData, footageMeta, styles);
+        },
+
+        // The number of objects of each class over the footage (see build_timeline_data in app.py)
+        timeline: function (timeline, styles) {
+            if (!timeline) {
+                return {data: [], layout: styles.layouts.timeline};
+            }
+
+            return {
+                data: timeline.classes.map(function (name, index) {
+                    return {
+                        type: 'scatter',
+                        mode: 'lines',
+                        stackgroup: 'classes',
+                        line: {width: 0.5},
+                        name: name,
+                        x: timeline.times,
+                        y: timeline.counts[index]
+                    };
+                }),
+                layout: styles.layouts.timeline
+            };
+        },
+
+        // The boxes of the current frame drawn over the video in bounding box mode, from the detections of the
+        // payload. The overlay is only drawn again when the resolved frame changes
+        boxOverlay: function (frame, payload, displayMode, threshold, styles, currentFigure) {
+            var arrays = null;
+            var currentFrame = null;
+            if (displayMode === 'bounding_box' && frame !== null && frame !== undefined && payload) {
+                arrays = getArrays(payload);
+                currentFrame = resolveFrame(payload, arrays, frame);
+            }
+
+            var key = (payload ? payload.footage : null) + '/' + currentFrame + '/' + threshold;
+            if (currentFigure && currentFigure.layout && currentFigure.layout.datarevision === key) {
+                return window.dash_clientside.no_update;
+            }
+
+            var boxes = currentFrame !== null ? frameBoxes(payload, arrays, currentFrame, threshold) : null;
+            var rendered = boxOverlayFigure(boxes, styles);
+            rendered.layout.datarevision = key;
+            return rendered;
+        },
+
+        // The boxes of the current frame drawn over the video, as sent by the server (see build_frame_boxes)
+        boxOverlayFromData: function (frameBoxes, styles) {
+            return boxOverlayFigure(frameBoxes, styles);
+        }
+    }
+});
@@ -0,0 +1,178 @@
+"""Reading and writing of the object detections of a footage.
+
+The detections are stored column by column in a binary .npz archive: the frame as int32, the box coordinates and the
+score as float32, the COCO class id as int16, and the class names as int16 codes into a table of categories (loaded
+back as a pandas categorical). CSV files are still supported as an import format.
+
+Usage (from the root of the repository), to convert CSV detection files:
+    python -m utils.detection_store data/CarFootage_object_data.csv data/Zebra_object_data.csv
+"""
+import io
+import json
+import os
+import shutil
+import sys
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+
+DETECTION_COLUMNS = {
+    "frame": np.int32,
+    "y": np.float32,
+    "x": np.float32,
+    "bottom": np.float32,
+    "right": np.float32,
+    "class": np.int16,
+    "score": np.float32
+}
+DETECTION_SUFFIX = ".npz"
+
+
+def is_url(path):
+    return path.startswith(("http://", "https://"))
+
+
+def open_binary(path):
+    """Return a file-like object to read from the given path or URL."""
+    if is_url(path):
+        with urlopen(path) as response:
+            return io.BytesIO(response.read())
+    return open(path, 'rb')
+
+
+def save_detections(video_info_df, path):
+    """Save a dataframe of detections as a binary columnar archive."""
+    class_str = pd.Categorical(video_info_df["class_str"])
+    columns = {name: video_info_df[name].values.astype(dtype) for name, dtype in DETECTION_COLUMNS.items()}
+
+    np.savez(
+        path,
+        class_codes=class_str.codes.astype(np.int16),
+        class_categories=np.array(class_str.categories, dtype=str),
+        **columns
+    )
+
+
+def load_detections(path):
+    """Load the detections stored at the given path or URL, either as a binary archive or as a CSV file. Returns a
+    dataframe with compact dtypes and a categorical class_str column."""
+    if os.path.splitext(path)[1] != DETECTION_SUFFIX:
+        video_info_df = pd.read_csv(path, dtype=DETECTION_COLUMNS)
+        video_info_df["class_str"] = video_info_df["class_str"].astype("category")
+        return video_info_df
+
+    with open_binary(path) as file, np.load(file, allow_pickle=False) as archive:
+        columns = {name: archive[name] for name in DETECTION_COLUMNS}
+        class_str = pd.Categorical.from_codes(archive["class_codes"], archive["class_categories"])
+
+    video_info_df = pd.DataFrame(columns)
+    video_info_df.insert(list(DETECTION_COLUMNS).index("class") + 1, "class_str", class_str)
+    return video_info_df
+
+
+class DetectionBuffer:
+    """Growable column buffers accumulating the detections of a video, frame after frame. The buffers double in
+    size when full, so appending a frame only copies its detections, and the dataframe is built once at the end."""
+
+    def __init__(self, capacity=4096):
+        self._columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in DETECTION_COLUMNS.items()}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, size):
+        capacity = len(self._columns["frame"])
+        if size <= capacity:
+            return
+
+        while capacity < size:
+            capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self._columns[name] = grown
+
+    def append(self, frame, boxes, classes, scores):
+        """Append the detections of a frame: boxes of shape [N, 4] as (y, x, bottom, right), classes and scores of
+        shape [N]."""
+        start, stop = self.size, self.size + len(scores)
+        self._reserve(stop)
+
+        self._columns["frame"][start:stop] = frame
+        for index, name in enumerate(("y", "x", "bottom", "right")):
+            self._columns[name][start:stop] = boxes[:, index]
+        self._columns["class"][start:stop] = classes
+        self._columns["score"][start:stop] = scores
+        self.size = stop
+
+    def clear(self):
+        self.size = 0
+
+    def to_dataframe(self, class_names):
+        """Return the detections as a dataframe. class_names is the lookup array from a class id to its name."""
+        video_info_df = pd.DataFrame({name: column[:self.size] for name, column in self._columns.items()})
+        class_str = pd.Categorical(class_names[video_info_df["class"].values])
+        video_info_df.insert(list(DETECTION_COLUMNS).index("class") + 1, "class_str", class_str)
+        return video_info_df
+
+
+class DetectionChunkWriter:
+    """Streams the detections of a video to a directory of chunk files, along with a checkpoint of the last frame
+    whose detections were written. An interrupted ingest can then resume after the checkpoint, and the memory used
+    by the detections is bounded by the size of a chunk."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self.checkpoint = {"last_frame": 0, "chunks": []}
+        if os.path.exists(self._checkpoint_path):
+            with open(self._checkpoint_path) as file:
+                self.checkpoint = json.load(file)
+
+    @property
+    def _checkpoint_path(self):
+        return os.path.join(self.directory, "checkpoint.json")
+
+    @property
+    def last_frame(self):
+        return self.checkpoint["last_frame"]
+
+    def flush(self, detection_buffer, last_frame, class_names):
+        """Write the buffered detections, which must be the ones of the frames up to last_frame, as a new chunk.
+        The buffer is emptied, and the checkpoint is only updated once the chunk is written."""
+        chunk_name = f"chunk_{len(self.checkpoint['chunks']):06d}{DETECTION_SUFFIX}"
+        save_detections(detection_buffer.to_dataframe(class_names), os.path.join(self.directory, chunk_name))
+        detection_buffer.clear()
+
+        checkpoint = {"last_frame": int(last_frame), "chunks": self.checkpoint["chunks"] + [chunk_name]}
+        temporary_path = f"{self._checkpoint_path}.tmp"
+        with open(temporary_path, 'w') as file:
+            json.dump(checkpoint, file)
+        os.replace(temporary_path, self._checkpoint_path)  # Atomic, so a crash never leaves a partial checkpoint
+        self.checkpoint = checkpoint
+
+    def merge(self):
+        """Return the detections of all the chunks of the checkpoint as a single dataframe."""
+        chunks = [load_detections(os.path.join(self.directory, chunk_name))
+                  for chunk_name in self.checkpoint["chunks"]]
+        video_info_df = pd.concat(chunks, ignore_index=True)
+        video_info_df["class_str"] = video_info_df["class_str"].astype("category")
+        return video_info_df
+
+    def remove(self):
+        shutil.rmtree(self.directory)
+
+
+def main(paths):
+    for path in paths:
+        video_info_df = load_detections(path)
+        output_path = f"{os.path.splitext(path)[0]}{DETECTION_SUFFIX}"
+        save_detections(video_info_df, output_path)
+        print(f"{path}: {video_info_df.shape[0]} detections -> {output_path}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,201 @@
+"""The catalog of the footages displayed by the dashboard.
+
+The catalog is a JSON manifest listing, for each footage, its id (the value of the footage dropdown), its label, the
+path or URL of its detections, the path of its memory-mapped store on the dashboard host (see
+utils/footage_store.py, by default the one next to local detections), the URL of its video, and metadata about it:
+the frame rate, the number of frames, the number of detections, the list of detected classes, and how the frames
+were sampled by the ingest (see utils/frame_sampling.py). The dashboard reloads the manifest when it changes on
+disk, so adding a footage doesn't require a redeploy.
+
+Usage (from the root of the repository), to add or update the entries of detection files:
+    python -m utils.footage_catalog data/catalog.json data/FarmDroneDetectionData.npz --fps 24 \\
+        --video-url "http://localhost:8765/data/videos/{name}.mp4"
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.detection_store import is_url, load_detections
+
+DEFAULT_ENTRY = {
+    "label": None,
+    "detections": None,
+    "store": None,
+    "videos": {},
+    "fps": None,
+    "frame_count": None,
+    "row_count": None,
+    "classes": None,
+    "sampling": None
+}
+# Minimum number of seconds between two checks of the manifest modification time
+REFRESH_INTERVAL = 5.0
+
+
+class FootageCatalog:
+    """The footages listed in a JSON manifest, in the order of the manifest. Relative detection and store paths are
+    resolved from the directory of the manifest."""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = OrderedDict()
+        self._mtime = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Reload the manifest if it was modified since it was last read. Unless forced, the modification time is
+        only checked every REFRESH_INTERVAL seconds."""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < REFRESH_INTERVAL:
+            return
+        self._checked_at = now
+
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._mtime:
+            return
+
+        manifest = read_manifest(self.path)
+        entries = OrderedDict()
+        for entry in manifest["footage"]:
+            entry = dict(DEFAULT_ENTRY, **entry)
+            entry["label"] = entry["label"] or entry["id"]
+            entry["detections"] = self._resolve(entry["detections"])
+            entry["store"] = self._resolve(entry["store"])
+            entries[entry["id"]] = entry
+
+        with self._lock:
+            self._entries = entries
+            self._mtime = mtime
+
+    def _resolve(self, path):
+        if path is None or is_url(path) or os.path.isabs(path):
+            return path
+        return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(self.path)), path))
+
+    def __getitem__(self, footage):
+        self.refresh()
+        return self._entries[footage]
+
+    def __contains__(self, footage):
+        self.refresh()
+        return footage in self._entries
+
+    def __iter__(self):
+        self.refresh()
+        return iter(list(self._entries))
+
+    def __len__(self):
+        self.refresh()
+        return len(self._entries)
+
+    def dropdown_options(self):
+        """Return the options of the footage dropdown."""
+        self.refresh()
+        return [{'label': entry["label"], 'value': footage} for footage, entry in self._entries.items()]
+
+    def video_url(self, footage):
+        return self[footage]["videos"]["regular"]
+
+
+def read_manifest(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_manifest(manifest, path):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=2)
+        file.write('\n')
+    os.replace(temporary_path, path)  # Atomic, so the dashboard workers never read a partial manifest
+
+
+def scan_detections(path):
+    """Return the metadata of the catalog entry of a detection file: its number of frames (as far as the detections
+    tell, i.e. the last frame with detections), number of detections and list of classes (by decreasing number of
+    detections)."""
+    video_info_df = load_detections(path)
+    class_counts = video_info_df["class_str"].value_counts()
+
+    return {
+        "frame_count": int(video_info_df["frame"].max()) if video_info_df.shape[0] > 0 else 0,
+        "row_count": int(video_info_df.shape[0]),
+        "classes": class_counts[class_counts > 0].index.tolist()
+    }
+
+
+def update_manifest(manifest_path, detection_paths, fps=None, video_url=None, sampling=None, names=None,
+                    stores=None, frame_counts=None):
+    """Add (or update) the entries of the given detection files (paths or URLs) to the manifest. The entry id is
+    the matching name in names (e.g. the name of the video the detections come from), by default the name of the
+    file without extension, and the video URL is a template formatted with that name. stores are the paths of the
+    footage stores of the files, if not next to them, and frame_counts the number of frames of their videos, if
+    known (otherwise read from the detections). sampling is the summary of the frame sampler the detections were
+    produced with."""
+    if os.path.exists(manifest_path):
+        manifest = read_manifest(manifest_path)
+    else:
+        manifest = {"footage": []}
+
+    entries = OrderedDict((entry["id"], entry) for entry in manifest["footage"])
+    manifest_directory = os.path.dirname(os.path.abspath(manifest_path))
+
+    if names is None:
+        names = [os.path.splitext(os.path.basename(path))[0] for path in detection_paths]
+
+    if stores is None:
+        stores = [None] * len(detection_paths)
+    if frame_counts is None:
+        frame_counts = [None] * len(detection_paths)
+
+    for path, name, store, frame_count in zip(detection_paths, names, stores, frame_counts):
+        entry = entries.setdefault(name, {"id": name, "label": name})
+        entry["detections"] = path if is_url(path) else os.path.relpath(os.path.abspath(path), manifest_directory)
+        if store is not None:
+            entry["store"] = os.path.relpath(os.path.abspath(store), manifest_directory)
+
+        videos = entry.setdefault("videos", {})
+        if video_url is not None:
+            videos["regular"] = video_url.format(name=name)
+        if fps is not None:
+            entry["fps"] = fps
+        if sampling is not None:
+            entry["sampling"] = sampling
+
+        entry.update(scan_detections(path))
+        if frame_count is not None:
+            entry["frame_count"] = frame_count
+        print(f"{path}: {entry['row_count']} detections, {entry['frame_count']} frames, "
+              f"{len(entry['classes'])} classes")
+
+    manifest["footage"] = list(entries.values())
+    write_manifest(manifest, manifest_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add detection files to the footage catalog of the dashboard.")
+    parser.add_argument("manifest", help="path of the JSON manifest, created if it doesn't exist")
+    parser.add_argument("detections", nargs='+', help="detection files (.npz or .csv), paths or URLs")
+    parser.add_argument("--fps", type=float, help="frame rate of the detections")
+    parser.add_argument("--video-url", help="URL template of the regular video, e.g. http://host/{name}.mp4")
+    parser.add_argument("--name", help="id of the entry (and {name} of the video URL), for a single detection file")
+    parser.add_argument("--store", help="path of the footage store built for a single detection file, see "
+                                        "footage_store")
+    args = parser.parse_args()
+
+    if (args.name is not None or args.store is not None) and len(args.detections) > 1:
+        parser.error("--name and --store only apply to a single detection file")
+    names = [args.name] if args.name is not None else None
+    stores = [args.store] if args.store is not None else None
+
+    update_manifest(args.manifest, args.detections, fps=args.fps, video_url=args.video_url, names=names,
+                    stores=stores)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Memory-mapped storage of the detections and tiles of a footage.
+
+A footage store is a directory holding one .npy file per array: the detection columns sorted by frame (with the
+CSR-style frame offsets), and the per-frame tiles (see utils/frame_tiles.py). The dashboard opens the arrays
+read-only with numpy.memmap, so every gunicorn worker shares the same page cache copy of the data instead of
+holding its own copy on the heap.
+
+Usage (from the root of the repository), to build the stores of detection files, next to each of them:
+    python -m utils.footage_store data/CarFootage_object_data.npz data/Zebra_object_data.csv
+
+The detections of deployed footages are URLs, so their store is built on the dashboard host with an explicit
+output path, which is then recorded as the "store" of their catalog entry (see utils/footage_catalog.py):
+    python -m utils.footage_store http://host/data/csv/24.csv --output data/stores/24.mmap
+    python -m utils.footage_catalog data/catalog.json http://host/data/csv/24.csv --name 24.mp4 \\
+        --store data/stores/24.mmap
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.detection_store import DETECTION_COLUMNS, is_url, load_detections
+from utils.frame_tiles import build_frame_tiles
+
+FOOTAGE_STORE_SUFFIX = ".mmap"
+
+
+def footage_store_path(detection_path):
+    """Return the path of the footage store of the given detection file."""
+    root, _ = os.path.splitext(detection_path)
+    return f"{root}{FOOTAGE_STORE_SUFFIX}"
+
+
+def build_detection_arrays(video_info_df):
+    """Return the columns of a dataframe of detections as arrays sorted by frame (stable, so the score order inside
+    a frame is kept), along with the class names table and the CSR-style offsets: the detections of frame f are the
+    rows frame_offsets[f] to frame_offsets[f + 1]."""
+    video_info_df = video_info_df.sort_values("frame", kind="mergesort")
+    class_str = pd.Categorical(video_info_df["class_str"])
+
+    arrays = {name: video_info_df[name].values.astype(dtype) for name, dtype in DETECTION_COLUMNS.items()}
+    arrays["class_codes"] = class_str.codes.astype(np.int16)
+    arrays["class_categories"] = np.array(class_str.categories, dtype=str)
+
+    max_frame = int(arrays["frame"].max()) if arrays["frame"].shape[0] > 0 else 0
+    arrays["frame_offsets"] = np.searchsorted(arrays["frame"], np.arange(max_frame + 2), side='left')
+
+    return arrays
+
+
+def build_footage_store(video_info_df):
+    return {
+        "detections": build_detection_arrays(video_info_df),
+        "tiles": build_frame_tiles(video_info_df)
+    }
+
+
+def save_footage_store(store, directory):
+    for group, arrays in store.items():
+        os.makedirs(os.path.join(directory, group), exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, group, f"{name}.npy"), array)
+
+
+def load_footage_store(directory, mmap_mode='r'):
+    """Open the arrays of a footage store, memory-mapped read-only by default."""
+    store = {}
+    for group in ("detections", "tiles"):
+        group_directory = os.path.join(directory, group)
+        store[group] = {
+            os.path.splitext(file_name)[0]: np.load(os.path.join(group_directory, file_name),
+                                                    mmap_mode=mmap_mode, allow_pickle=False)
+            for file_name in os.listdir(group_directory) if file_name.endswith(".npy")
+        }
+    return store
+
+
+def get_frame_detections(detections, frame):
+    """Return the detections at the given frame as a dataframe. Only the rows of the frame are read from the
+    arrays, so the lookup doesn't depend on the length of the footage."""
+    frame_offsets = detections["frame_offsets"]
+    if 0 <= frame < len(frame_offsets) - 1:
+        start, stop = frame_offsets[frame], frame_offsets[frame + 1]
+    else:
+        start = stop = 0
+
+    frame_df = pd.DataFrame({name: np.asarray(detections[name][start:stop]) for name in DETECTION_COLUMNS})
+    class_str = pd.Categorical.from_codes(np.asarray(detections["class_codes"][start:stop]),
+                                          detections["class_categories"])
+    frame_df.insert(list(DETECTION_COLUMNS).index("class") + 1, "class_str", class_str)
+    return frame_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped stores of detection files.")
+    parser.add_argument("detections", nargs='+', help="detection files (.npz or .csv), paths or URLs")
+    parser.add_argument("--output", help="path of the store, for a single detection file (required for a URL)")
+    args = parser.parse_args()
+
+    if args.output is not None and len(args.detections) > 1:
+        parser.error("--output only applies to a single detection file")
+
+    for path in args.detections:
+        if args.output is None and is_url(path):
+            parser.error(f"{path} is a URL, the path of its store must be given with --output")
+
+    for path in args.detections:
+        video_info_df = load_detections(path)
+        store_path = args.output or footage_store_path(path)
+        save_footage_store(build_footage_store(video_info_df), store_path)
+        print(f"{path}: {video_info_df.shape[0]} detections -> {store_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Selection of the frames of a video that are run through the detection model.
+
+The dashboard only queries a few frames per second, so running the model on every decoded frame is mostly wasted.
+A FrameSampler keeps one frame every `stride` frames, or, in scene-change mode, the frames that differ enough from
+the last kept frame (measured on small grayscale thumbnails), with at least one frame every `max_gap` frames. Among
+the kept frames, a DuplicateGate spots the ones nearly identical to the last frame the model ran on, so that its
+detections are reused.
+"""
+import cv2 as cv
+import numpy as np
+
+# Size of the thumbnails the frames are compared on
+THUMBNAIL_SIZE = (64, 36)
+
+
+def thumbnail(image):
+    """Return a small grayscale version of a (BGR) frame, with values in [0, 1]."""
+    gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    return cv.resize(gray, THUMBNAIL_SIZE, interpolation=cv.INTER_AREA).astype(np.float32) / 255
+
+
+def frame_difference(thumbnail_a, thumbnail_b):
+    """Return the mean absolute difference of two thumbnails, between 0 (identical) and 1."""
+    return float(np.mean(np.abs(thumbnail_a - thumbnail_b)))
+
+
+class FrameSampler:
+    """Decides which of the decoded frames are kept, and counts them."""
+
+    def __init__(self, stride=1, scene_threshold=None, max_gap=None):
+        self.stride = max(1, int(stride))
+        self.scene_threshold = scene_threshold
+        self.max_gap = max_gap
+
+        self.decoded_frames = 0
+        self.sampled_frames = 0
+        self._last_frame = None
+        self._last_thumbnail = None
+
+    @classmethod
+    def from_rates(cls, video_fps, stride=1, target_fps=None, scene_threshold=None):
+        """Create a sampler for a video of the given frame rate. A target frame rate overrides the stride, and in
+        scene-change mode at least one frame per second is kept."""
+        if target_fps is not None and video_fps > 0:
+            stride = max(1, round(video_fps / target_fps))
+
+        max_gap = max(1, round(video_fps)) if scene_threshold is not None else None
+        return cls(stride=stride, scene_threshold=scene_threshold, max_gap=max_gap)
+
+    @property
+    def active(self):
+        return self.stride > 1 or self.scene_threshold is not None
+
+    @property
+    def needs_image(self):
+        """Whether the decoded image is needed to decide, otherwise the frame doesn't have to be decoded."""
+        return self.scene_threshold is not None
+
+    def sample(self, frame, image=None):
+        """Return whether the given frame (its index, and its image in scene-change mode) is kept."""
+        self.decoded_frames += 1
+        gap = None if self._last_frame is None else frame - self._last_frame
+
+        if self.scene_threshold is None:
+            sampled = gap is None or gap >= self.stride
+        else:
+            frame_thumbnail = thumbnail(image)
+            sampled = gap is None or (gap >= self.stride and (
+                gap >= self.max_gap or frame_difference(frame_thumbnail, self._last_thumbnail) > self.scene_threshold
+            ))
+            if sampled:
+                self._last_thumbnail = frame_thumbnail
+
+        if sampled:
+            self._last_frame = frame
+            self.sampled_frames += 1
+        return sampled
+
+    def summary(self):
+        """Return the settings of the sampler and the rate of frames it kept."""
+        return {
+            "stride": self.stride,
+            "scene_threshold": self.scene_threshold,
+            "max_gap": self.max_gap,
+            "decoded_frames": self.decoded_frames,
+            "sampled_frames": self.sampled_frames,
+            "sampling_rate": self.sampled_frames / self.decoded_frames if self.decoded_frames > 0 else 1.0
+        }
+
+
+class DuplicateGate:
+    """Detects the frames nearly identical to the last frame the model ran on, whose detections can be reused
+    instead of running the model again (e.g. static CCTV footage). Frames are compared to that reference frame
+    rather than to the previous one, so a slow drift still ends up running the model."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+        self.reused_frames = 0
+        self._reference_thumbnail = None
+
+    def is_duplicate(self, image):
+        """Return whether the model can be skipped on the given frame. Otherwise the frame becomes the reference."""
+        frame_thumbnail = thumbnail(image)
+        if (self._reference_thumbnail is not None
+                and frame_difference(frame_thumbnail, self._reference_thumbnail) <= self.threshold):
+            self.reused_frames += 1
+            return True
+
+        self._reference_thumbnail = frame_thumbnail
+        return False
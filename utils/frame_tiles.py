@@ -0,0 +1,157 @@
+"""Per-frame aggregates ("tiles") of the object detections of a footage.
+
+The detections are static once a video has been processed, so everything the dashboard displays for a frame can be
+materialized ahead of time: the top 8 scores of the frame, and for each class of the frame, the highest score and
+the number of detections above every threshold of the confidence slider. The dashboard then only slices the tiles,
+including for the timeline of the number of objects of each class over the whole footage.
+
+Usage (from the root of the repository):
+    python -m utils.frame_tiles data/CarFootage_object_data.npz data/Zebra_object_data.csv
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.detection_store import load_detections, open_binary
+
+# The thresholds of the confidence slider, in percent. The tiles hold one bucket per threshold.
+THRESHOLD_BUCKETS = np.arange(20, 81)
+# The number of most probable objects displayed in the score bar chart
+TOP_K = 8
+TILES_SUFFIX = "_tiles.npz"
+
+
+def frame_tiles_path(detection_path):
+    """Return the path of the tiles of the given detection file (local path or URL)."""
+    root, _ = os.path.splitext(detection_path)
+    return f"{root}{TILES_SUFFIX}"
+
+
+def build_frame_tiles(video_info_df):
+    """Compute the tiles of a dataframe of detections (see utils/detection_store.py). The classes are ordered by
+    decreasing number of detections, and the detections of a class inside a frame are stored as (frame, class)
+    pairs, in a CSR layout over the frames."""
+    class_counts = video_info_df["class_str"].value_counts()
+    classes = class_counts[class_counts > 0].index.tolist()
+    n_buckets = len(THRESHOLD_BUCKETS)
+
+    frames = video_info_df["frame"].values.astype(np.int64)
+    codes = pd.Categorical(video_info_df["class_str"], categories=classes).codes.astype(np.int16)
+    scores = video_info_df["score"].values
+    max_frame = int(frames.max()) if frames.shape[0] > 0 else 0
+
+    # Number of detections above each threshold bucket, summed over the (frame, class) pairs
+    above = (scores[:, None] > THRESHOLD_BUCKETS[None, :] / 100).astype(np.int32)
+    pairs_df = pd.DataFrame(above)
+    pairs_df["frame"] = frames
+    pairs_df["code"] = codes
+    pairs_df["max_score"] = scores
+    grouped = pairs_df.groupby(["frame", "code"], sort=True)
+    pair_counts = grouped[list(range(n_buckets))].sum()
+    pair_max = grouped["max_score"].max()
+
+    pair_frames = pair_counts.index.get_level_values("frame").values
+    pair_offsets = np.searchsorted(pair_frames, np.arange(max_frame + 2), side='left')
+
+    # The TOP_K highest scores of each frame, padded with a score of 0 and a class of -1
+    top_df = pd.DataFrame({"frame": frames, "code": codes, "score": scores})
+    top_df = top_df.sort_values(["frame", "score"], ascending=[True, False], kind="mergesort")
+    rank = top_df.groupby("frame").cumcount().values
+    top_df = top_df[rank < TOP_K]
+    rank = rank[rank < TOP_K]
+
+    top_scores = np.zeros((max_frame + 1, TOP_K), dtype=np.float32)
+    top_classes = np.full((max_frame + 1, TOP_K), -1, dtype=np.int16)
+    top_scores[top_df["frame"].values, rank] = top_df["score"].values
+    top_classes[top_df["frame"].values, rank] = top_df["code"].values
+
+    return {
+        "classes": np.array(classes, dtype=str),
+        "thresholds": THRESHOLD_BUCKETS,
+        "pair_offsets": pair_offsets,
+        "pair_classes": pair_counts.index.get_level_values("code").values.astype(np.int16),
+        "pair_max": pair_max.values.astype(np.float32),
+        "pair_counts": np.minimum(pair_counts.values, np.iinfo(np.uint8).max).astype(np.uint8),
+        "top_scores": top_scores,
+        "top_classes": top_classes
+    }
+
+
+def save_frame_tiles(tiles, path):
+    np.savez_compressed(path, **tiles)
+
+
+def load_frame_tiles(path):
+    """Load the tiles stored at the given path or URL. Raises an OSError if they don't exist."""
+    with open_binary(path) as file, np.load(file, allow_pickle=False) as archive:
+        return {key: archive[key] for key in archive.files}
+
+
+def threshold_bucket(tiles, threshold):
+    """Return the index of the bucket of the tiles of a threshold in percent."""
+    thresholds = tiles["thresholds"]
+    return int(np.clip(np.searchsorted(thresholds, threshold), 0, len(thresholds) - 1))
+
+
+def get_frame_aggregates(tiles, frame, threshold):
+    """Slice the aggregates of the given frame out of the tiles, for a threshold in percent. Returns a dictionary
+    with the codes and scores of the (at most TOP_K) most probable objects, and the codes, counts and highest score
+    of each class detected above the threshold, ordered by decreasing count."""
+    bucket = threshold_bucket(tiles, threshold)
+    pair_offsets = tiles["pair_offsets"]
+
+    if not 0 <= frame < len(pair_offsets) - 1:
+        start = stop = 0
+    else:
+        start, stop = pair_offsets[frame], pair_offsets[frame + 1]
+
+    counts = tiles["pair_counts"][start:stop, bucket].astype(np.int64)
+    detected = counts > 0
+    counts = counts[detected]
+    order = np.argsort(-counts, kind="mergesort")
+
+    # The scores of a frame are sorted, so the objects above the threshold are the first ones
+    n_top = min(int(counts.sum()), tiles["top_scores"].shape[1])
+    top_start = frame if 0 <= frame < tiles["top_scores"].shape[0] else 0
+
+    return {
+        "top_classes": tiles["top_classes"][top_start, :n_top],
+        "top_scores": tiles["top_scores"][top_start, :n_top],
+        "class_codes": tiles["pair_classes"][start:stop][detected][order],
+        "class_counts": counts[order],
+        "class_max": tiles["pair_max"][start:stop][detected][order]
+    }
+
+
+def build_timeline(tiles, threshold, max_bins):
+    """Return the number of objects of each class detected above a threshold in percent over the whole footage,
+    downsampled to at most max_bins bins of consecutive frames, each holding the highest count of its frames. Returns
+    the first frame of each bin, and the [bins, classes] matrix of the counts (classes in the order of the tiles)."""
+    bucket = threshold_bucket(tiles, threshold)
+    pair_offsets = np.asarray(tiles["pair_offsets"])
+    n_frames = len(pair_offsets) - 1
+
+    # The frame of each (frame, class) pair, and the bin of that frame
+    pair_frames = np.repeat(np.arange(n_frames), np.diff(pair_offsets))
+    frames_per_bin = max(1, -(-n_frames // max_bins))
+    n_bins = -(-n_frames // frames_per_bin)
+
+    counts = np.zeros((n_bins, len(tiles["classes"])), dtype=np.int32)
+    np.maximum.at(counts, (pair_frames // frames_per_bin, np.asarray(tiles["pair_classes"])),
+                  np.asarray(tiles["pair_counts"][:, bucket]))
+
+    return np.arange(n_bins) * frames_per_bin, counts
+
+
+def main(paths):
+    for path in paths:
+        video_info_df = load_detections(path)
+        tiles_path = frame_tiles_path(path)
+        save_frame_tiles(build_frame_tiles(video_info_df), tiles_path)
+        print(f"{path}: {video_info_df.shape[0]} detections -> {tiles_path}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -1,163 +1,465 @@
 # coding: utf-8
+"""Run the object detection model on videos, and write the detections displayed by the dashboard.
+
+Usage (from the root of the repository):
+    python -m utils.generate_video_data "../videos/*.mp4" --workers 2 --catalog data/catalog.json
+"""
 import numpy as np
-import tensorflow as tf
 import cv2 as cv
 import time
+import argparse
 import base64
+import glob
+import os
+import queue
+import shutil
+import threading
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from utils.visualization_utils import visualize_boxes_and_labels_on_image_array  # Taken from Google Research GitHub
 from utils.mscoco_label_map import category_index
+from utils.detection_store import DetectionBuffer, DetectionChunkWriter, save_detections
+from utils.footage_catalog import update_manifest
+from utils.footage_store import build_footage_store, save_footage_store
+from utils.frame_sampling import DuplicateGate, FrameSampler
+from utils.frame_tiles import build_frame_tiles, save_frame_tiles
+from utils.inference_backends import BACKENDS, create_backend
 
 ############################# MODIFY BELOW #############################
+# Default values of the command line arguments
 
 # Generate the base64 string of each frame, not recommended
 ENCODE_B64 = False
 # Prints information about training in console
 VERBOSE = True
 # Show video being processed in window
-SHOW_PROCESS = True
-# Create a video with the bounding boxes
+SHOW_PROCESS = False
+# Write a copy of the video at OUTPUT_FPS, played by the dashboard (which draws the bounding boxes over it)
 WRITE_VIDEO_OUT = True
+# Also write the detections as CSV, besides the binary .npz format loaded by the dashboard
+WRITE_CSV = False
 # Minimum score threshold for a bounding box to be recorded in data
 THRESHOLD = 0.2
 OUTPUT_FPS = 24.0
-# Change name of video being processed
-VIDEO_FILE_NAME = "../videos/DroneCarFestival3"
-VIDEO_EXTENSION = ".mp4"
+# Number of frames fed to the model at once. Larger batches use the cores better, at the cost of memory
+BATCH_SIZE = 8
+# Number of threads drawing the bounding boxes on the frames
+DRAW_WORKERS = 4
+# Maximum number of batches waiting between two stages of the pipeline
+QUEUE_SIZE = 4
+# Number of frames whose detections are kept in memory before being flushed to a chunk on disk
+CHUNK_FRAMES = 1000
+# Resume from the checkpoint of an interrupted run of the same video, instead of starting over
+RESUME = True
+# Number of videos processed in parallel, each in its own process with its own copy of the model
+WORKERS = 1
+# Runtime of the model (tensorflow, onnxruntime or opencv, see utils/inference_backends.py), and its number of
+# threads inside an operation and across operations (None lets the runtime decide)
+BACKEND = "tensorflow"
+INTRA_OP_THREADS = None
+INTER_OP_THREADS = None
+# Run the model on one frame every STRIDE frames. TARGET_FPS, if set, overrides the stride to sample the video at
+# about that frame rate. With SCENE_THRESHOLD set, a frame is only sampled when it differs enough from the last
+# sampled one (mean absolute difference between 0 and 1), and at least once per second
+STRIDE = 1
+TARGET_FPS = None
+SCENE_THRESHOLD = None
+# With DEDUPE_THRESHOLD set, the model is skipped on the sampled frames that differ from the last frame it ran on by
+# at most this much (mean absolute difference between 0 and 1), and the detections of that frame are reused
+DEDUPE_THRESHOLD = None
+MODEL_PATH = "frozen_inference_graph.pb"
+# Text graph of the model, only needed by the opencv backend
+DNN_CONFIG_PATH = None
 
 ############################# MODIFY ABOVE #############################
 
-# Load a (frozen) Tensorflow model into memory.
-detection_graph = tf.Graph()
-with detection_graph.as_default():
-    od_graph_def = tf.GraphDef()
-    with tf.gfile.GFile("frozen_inference_graph.pb", 'rb') as fid:
-        serialized_graph = fid.read()
-        od_graph_def.ParseFromString(serialized_graph)
-        tf.import_graph_def(od_graph_def, name='')
-
-# Loading the videocapture objects
-cap = cv.VideoCapture(f'{VIDEO_FILE_NAME}{VIDEO_EXTENSION}')
-
-if WRITE_VIDEO_OUT:
-    # Setup the video creation process
-    fourcc = cv.VideoWriter_fourcc(*'MP4V')
-    out = cv.VideoWriter(f'{VIDEO_FILE_NAME}WithBoundingBoxes.mp4', fourcc, OUTPUT_FPS, (1280, 720))
-    out_orig = cv.VideoWriter(f'{VIDEO_FILE_NAME}Original.mp4', fourcc, OUTPUT_FPS, (1280, 720))
-
-# Start the session
-with detection_graph.as_default():
-    with tf.Session(graph=detection_graph) as sess:
-        # Definite input and output Tensors for detection_graph
-        image_tensor = detection_graph.get_tensor_by_name('image_tensor:0')
-        # Each box represents a part of the image where a particular object was detected.
-        detection_boxes = detection_graph.get_tensor_by_name('detection_boxes:0')
-        # Each score represent how level of confidence for each of the objects.
-        # Score is shown on the result image, together with the class label.
-        detection_scores = detection_graph.get_tensor_by_name('detection_scores:0')
-        detection_classes = detection_graph.get_tensor_by_name('detection_classes:0')
-        num_detections = detection_graph.get_tensor_by_name('num_detections:0')
-
-        frame_base64_ls = []  # The list containing the frame in base64 format and their timestamp
-        frame_info_ls = []  # The list containing the information about the frames
-
-        counter = 0
-        while cap.isOpened():
-            ret, image = cap.read()
-
-            if ret:
-                # Retrieve timestamp
-                curr_frame = int(cap.get(cv.CAP_PROP_POS_FRAMES))
-
-                # Convert image into an np array
-                image_np = np.array(image)
-                image_np_expanded = np.expand_dims(image_np, axis=0)
+# Maps a COCO class id to its name
+CLASS_NAMES = np.array([category_index[i]['name'] if i in category_index else 'N/A'
+                        for i in range(max(category_index) + 1)])
+
+# The model loaded by the current process, see get_backend
+_backend = None
+
+
+def get_backend(args):
+    """Load the model into memory with the inference backend of the arguments, once per process."""
+    global _backend
+
+    if _backend is None:
+        options = {"config_path": args.dnn_config} if args.backend == "opencv" else {}
+        _backend = create_backend(args.backend, args.model, intra_op_threads=args.intra_op_threads,
+                                  inter_op_threads=args.inter_op_threads, **options)
+
+    return _backend
+
+
+def decode_frames(cap, batch_size, sampler, duplicate_gate, decode_queue, stop_event):
+    """Decode stage: read the frames of the video selected by the sampler and put them in the queue in batches of
+    batch_size, along with their timestamp and whether they duplicate the last frame the model runs on (if there
+    is a duplicate gate). A None marks the end of the video."""
+    try:
+        batch_frames = []
+        batch_images = []
+        batch_duplicates = []
+        while cap.isOpened() and not stop_event.is_set():
+            if sampler.needs_image:
+                ret, image = cap.read()
+                if not ret:
+                    break
+                frame = int(cap.get(cv.CAP_PROP_POS_FRAMES))
+                if not sampler.sample(frame, image):
+                    continue
+            else:
+                # Only the sampled frames are decoded, the others are just grabbed from the stream
+                if not cap.grab():
+                    break
+                frame = int(cap.get(cv.CAP_PROP_POS_FRAMES))
+                if not sampler.sample(frame):
+                    continue
+                ret, image = cap.retrieve()
+                if not ret:
+                    break
+
+            batch_frames.append(frame)
+            batch_images.append(image)
+            batch_duplicates.append(duplicate_gate is not None and duplicate_gate.is_duplicate(image))
+
+            if len(batch_images) == batch_size:
+                decode_queue.put((batch_frames, batch_images, batch_duplicates))
+                batch_frames = []
+                batch_images = []
+                batch_duplicates = []
+
+        # The video ended in the middle of the batch
+        if batch_images:
+            decode_queue.put((batch_frames, batch_images, batch_duplicates))
+    finally:
+        decode_queue.put(None)
+
+
+def draw_frame(image, boxes, classes, scores):
+    """Draw stage: return a copy of the frame with the bounding boxes and information about the predictions."""
+    # Convert image into an np array
+    image_np = np.array(image)
+
+    # Draw the bounding boxes with information about the predictions
+    visualize_boxes_and_labels_on_image_array(
+        image_np,
+        boxes,
+        classes,
+        scores,
+        category_index,
+        use_normalized_coordinates=True,
+        line_thickness=2
+    )
+
+    return image_np
+
+
+def encode_frames(encode_queue, video_writer, frame_base64_ls, encode_b64):
+    """Encode stage: write the frames to the output video (if any), and the drawn frames in base64 (if enabled). The
+    queue holds the frames along with the futures of the draw stage in the order of the video, so the frames are
+    written in order. A None marks the end of the video."""
+    while True:
+        item = encode_queue.get()
+        if item is None:
+            break
+
+        curr_frame, image, drawn_frame = item
+
+        # Encode the image into base64
+        if encode_b64:
+            retval, buffer = cv.imencode('.png', drawn_frame.result())
+            img_str = base64.b64encode(buffer)
+            image_b64 = 'data:image/png;base64,{}'.format(img_str.decode('ascii'))
+
+            # Append the image along with timestamp to the frame_base64_ls
+            frame_base64_ls.append([curr_frame, image_b64])
+
+        # Update the output video
+        if video_writer is not None:
+            video_writer.write(image)  # Writes the original image
+
+
+def copy_frames(cap, video_writer, count):
+    """Write the next count frames of the video to the output video as they are."""
+    for _ in range(count):
+        ret, image = cap.read()
+        if not ret:
+            break
+        video_writer.write(image)
+
+
+def output_prefix(video_path, output_dir=None):
+    """Return the prefix of the output files of a video: its path without extension, inside output_dir if given."""
+    prefix = os.path.splitext(video_path)[0]
+    if output_dir is not None:
+        prefix = os.path.join(output_dir, os.path.basename(prefix))
+    return prefix
+
+
+def process_video(video_path, args):
+    """Run the model on the sampled frames of a video, and write its detections (.npz, tiles and memory-mapped
+    store), along with the output video. Returns the path of the detections and statistics about the run."""
+    prefix = output_prefix(video_path, args.output_dir)
+    backend = get_backend(args)
+
+    # Loading the videocapture objects
+    cap = cv.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise OSError(f"cannot open the video {video_path}")
+    sampler = FrameSampler.from_rates(cap.get(cv.CAP_PROP_FPS), stride=args.stride, target_fps=args.target_fps,
+                                      scene_threshold=args.scene_threshold)
+    duplicate_gate = DuplicateGate(args.dedupe_threshold) if args.dedupe_threshold is not None else None
+
+    # The output video holds the frames the model ran on, so it would skip the frames left out by the sampler
+    write_video = args.write_video and not sampler.active
+    if args.write_video and not write_video and args.verbose:
+        print(f"{video_path}: the frames are sampled, the output video is not written")
+
+    # The frame rate the detections are displayed at: the one of the output video, or of the video itself. The
+    # detections keep the frame numbers of the video, sampled frames or not
+    video_fps = args.output_fps if write_video else cap.get(cv.CAP_PROP_FPS)
+
+    # The detections are streamed to chunks on disk, along with a checkpoint of the last processed frame
+    chunks_directory = f"{prefix}DetectionData.chunks"
+    if not args.resume and os.path.isdir(chunks_directory):
+        shutil.rmtree(chunks_directory)
+    chunk_writer = DetectionChunkWriter(chunks_directory)
+
+    video_writer = None
+    if write_video:
+        # Setup the video creation process. The bounding boxes are drawn over the video by the dashboard, so they
+        # are not burnt into a second video
+        fourcc = cv.VideoWriter_fourcc(*'MP4V')
+        video_writer = cv.VideoWriter(f'{prefix}Original.mp4', fourcc, args.output_fps, (1280, 720))
+
+    # Skip the frames already processed by an interrupted run. The video it was writing is unreadable, so it is
+    # written again from the start: the frames up to the checkpoint are copied without running the model
+    start_frame = chunk_writer.last_frame
+    if start_frame > 0:
+        if video_writer is not None:
+            copy_frames(cap, video_writer, start_frame)
+        else:
+            cap.set(cv.CAP_PROP_POS_FRAMES, start_frame)
+        if args.verbose:
+            print(f"{video_path}: resuming after frame {start_frame}")
+
+    start_time = time.time()
+    counter = 0
+
+    frame_base64_ls = []  # The list containing the frame in base64 format and their timestamp
+    detection_buffer = DetectionBuffer()  # The information about the frames
+
+    # The decode and encode stages run in their own thread, and the draw stage in a pool of threads, so
+    # that the inference doesn't wait on OpenCV
+    decode_queue = queue.Queue(maxsize=args.queue_size)
+    encode_queue = queue.Queue(maxsize=args.queue_size * args.batch_size)
+    stop_event = threading.Event()
+    decoder = threading.Thread(target=decode_frames,
+                               args=(cap, args.batch_size, sampler, duplicate_gate, decode_queue, stop_event),
+                               daemon=True)
+    encoder = threading.Thread(target=encode_frames,
+                               args=(encode_queue, video_writer, frame_base64_ls, args.encode_b64),
+                               daemon=True)
+    decoder.start()
+    encoder.start()
+
+    # The stages are stopped and the video released whether the run completes, is stopped or fails, since the
+    # worker processes are reused for the next videos
+    last_frame = start_frame
+    try:
+        with ThreadPoolExecutor(max_workers=args.draw_workers) as draw_pool:
+            last_results = None  # The results of the last frame the model ran on, reused by its duplicates
+            while True:
+                batch = decode_queue.get()
+                if batch is None:
+                    break
+                batch_frames, batch_images, batch_duplicates = batch
+                inferred_images = [image for image, duplicate in zip(batch_images, batch_duplicates)
+                                   if not duplicate]
 
                 t1 = time.time()
 
-                # Run the algorithm, retrieve the boxes, score and classes
-                (boxes, scores, classes, num) = sess.run(
-                    [detection_boxes, detection_scores, detection_classes, num_detections],
-                    feed_dict={image_tensor: image_np_expanded})
+                # Run the algorithm on the frames of the batch that aren't duplicates, retrieve the boxes, score
+                # and classes of every frame
+                if inferred_images:
+                    (batch_boxes, batch_scores, batch_classes, batch_num) = backend.detect(inferred_images)
 
                 t2 = time.time()
 
-                # Remove the leading 1 dimension
-                boxes = np.squeeze(boxes)
-                classes = np.squeeze(classes).astype(np.int32)
-                scores = np.squeeze(scores)
-
-                # Draw the bounding boxes with information about the predictions
-                visualize_boxes_and_labels_on_image_array(
-                    image_np,
-                    boxes,
-                    classes,
-                    scores,
-                    category_index,
-                    use_normalized_coordinates=True,
-                    line_thickness=2
-                )
-
-                # Encode the image into base64
-                if ENCODE_B64:
-                    retval, buffer = cv.imencode('.png', image_np)
-                    img_str = base64.b64encode(buffer)
-                    image_b64 = 'data:image/png;base64,{}'.format(img_str.decode('ascii'))
-
-                    # Append the image along with timestamp to the frame_base64_ls
-                    frame_base64_ls.append([curr_frame, image_b64])
-
-                # Update the output video
-                if WRITE_VIDEO_OUT:
-                    out.write(image_np)
-                    out_orig.write(image)  # Writes the original image
-
-                # Process the information about the video at that exact timestamp
-                timestamp_df = pd.DataFrame([curr_frame for _ in range(int(num))], columns=["frame"])
-                boxes_df = pd.DataFrame(boxes, columns=['y', 'x', 'bottom', 'right'])
-                classes_df = pd.DataFrame(classes, columns=['class'])
-                score_df = pd.DataFrame(scores, columns=['score'])
-                # Maps a np array of integer to their coco index
-                coco_map = np.vectorize(lambda i: category_index[i]['name'])
-                classes_str_df = pd.DataFrame(coco_map(classes), columns=['class_str'])
-
-                # Concatenate all the information
-                info_df = pd.concat([timestamp_df, boxes_df, classes_df, classes_str_df, score_df], axis=1)
-
-                # Only keep the entries with a score over the threshold
-                narrow_info_df = info_df[info_df['score'] > THRESHOLD]
-
-                # Append it the list of information of all the frames
-                frame_info_ls.append(narrow_info_df)
-
-                t3 = time.time()
-
-                counter += 1
-                if VERBOSE:
-                    print(f"Algorithm runtime at frame {counter}: {t2-t1:.2f}")
-
-                if SHOW_PROCESS:
-                    cv.imshow('Object detection', image_np)
+                inferred = 0
+                for curr_frame, image, duplicate in zip(batch_frames, batch_images, batch_duplicates):
+                    # Split the results of the batch, a duplicate frame reuses the results of the last frame
+                    if not duplicate:
+                        last_results = (batch_boxes[inferred], batch_classes[inferred],
+                                        batch_scores[inferred], batch_num[inferred])
+                        inferred += 1
+                    boxes, classes, scores, num = last_results
+
+                    # Draw the frame in the pool if it's displayed, the encode stage waits for it in order
+                    drawn_frame = None
+                    if args.encode_b64 or args.show:
+                        drawn_frame = draw_pool.submit(draw_frame, image, boxes, classes, scores)
+                    if video_writer is not None or drawn_frame is not None:
+                        encode_queue.put((curr_frame, image, drawn_frame))
+
+                    # Only keep the entries with a score over the threshold, and record them
+                    keep = scores[:int(num)] > args.threshold
+                    detection_buffer.append(curr_frame, boxes[:int(num)][keep], classes[:int(num)][keep],
+                                            scores[:int(num)][keep])
+
+                    counter += 1
+
+                # Flush the detections to a new chunk, and move the checkpoint forward
+                last_frame = batch_frames[-1]
+                if last_frame - chunk_writer.last_frame >= args.chunk_frames:
+                    chunk_writer.flush(detection_buffer, last_frame, CLASS_NAMES)
+
+                if args.verbose and inferred_images:
+                    print(f"{video_path}: algorithm runtime at frame {counter}: {t2-t1:.2f} "
+                          f"({(t2-t1) / len(inferred_images):.2f} per frame, batch of {len(inferred_images)})")
+
+                if args.show:
+                    # Show the last frame of the batch
+                    cv.imshow('Object detection', drawn_frame.result())
 
                     if cv.waitKey(1) & 0xFF == ord('q'):
                         break
-
-            else:
-                break
-
-        if ENCODE_B64:
-            # Save the frames in base64
-            frame_base64_df = pd.DataFrame(frame_base64_ls, columns=['frame', 'source'])
-            frame_base64_df.to_csv("video_frames_b64.csv", index=False)
-
-        frame_info_df = pd.concat(frame_info_ls)
-        frame_info_df.to_csv(f"{VIDEO_FILE_NAME}DetectionData.csv", index=False)
-
-# Release processes
-cap.release()
-
-if WRITE_VIDEO_OUT:
-    out.release()
-    out_orig.release()
-
-cv.destroyAllWindows()
+    finally:
+        # Stop the decode stage, and unblock it if it waits on the queue
+        stop_event.set()
+        while decoder.is_alive():
+            try:
+                decode_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+        # All the frames have been drawn, wait for them to be written
+        encode_queue.put(None)
+        encoder.join()
+
+        # Release processes
+        cap.release()
+        if video_writer is not None:
+            video_writer.release()
+        if args.show:
+            cv.destroyAllWindows()
+
+    elapsed = time.time() - start_time
+
+    if args.encode_b64:
+        # Save the frames in base64
+        frame_base64_df = pd.DataFrame(frame_base64_ls, columns=['frame', 'source'])
+        frame_base64_df.to_csv(f"{prefix}FramesB64.csv", index=False)
+
+    # Flush the last detections, and gather all the chunks of the video
+    chunk_writer.flush(detection_buffer, last_frame, CLASS_NAMES)
+    frame_info_df = chunk_writer.merge()
+    detections_path = f"{prefix}DetectionData.npz"
+    save_detections(frame_info_df, detections_path)
+    if args.write_csv:
+        frame_info_df.to_csv(f"{prefix}DetectionData.csv", index=False)
+
+    # Materialize the per-frame aggregates displayed by the dashboard
+    save_frame_tiles(build_frame_tiles(frame_info_df), f"{prefix}DetectionData_tiles.npz")
+    # Write the memory-mapped store opened by the dashboard workers
+    save_footage_store(build_footage_store(frame_info_df), f"{prefix}DetectionData.mmap")
+
+    # The video is complete, the chunks are not needed anymore
+    chunk_writer.remove()
+
+    stats = {
+        "frames": counter,
+        "seconds": elapsed,
+        "fps": counter / elapsed if elapsed > 0 else 0.0,
+        "video_fps": video_fps,
+        "frame_count": start_frame + sampler.decoded_frames,
+        "backend": backend.name,
+        "sampling": sampler.summary(),
+        "inferences_saved": duplicate_gate.reused_frames if duplicate_gate is not None else 0
+    }
+    return detections_path, stats
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run the object detection model on videos.")
+    parser.add_argument("videos", nargs='+', help="paths or glob patterns of the videos to process")
+    parser.add_argument("--model", default=MODEL_PATH, help="path of the model (frozen inference graph or ONNX)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND, help="runtime of the model")
+    parser.add_argument("--intra-op-threads", type=int, default=INTRA_OP_THREADS,
+                        help="threads used inside an operation of the model")
+    parser.add_argument("--inter-op-threads", type=int, default=INTER_OP_THREADS,
+                        help="operations of the model run in parallel")
+    parser.add_argument("--dnn-config", default=DNN_CONFIG_PATH, help="text graph of the model, for the opencv backend")
+    parser.add_argument("--output-dir", help="directory of the outputs, next to each video by default")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="number of videos processed in parallel")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="minimum score of a recorded box")
+    parser.add_argument("--output-fps", type=float, default=OUTPUT_FPS, help="frame rate of the output video")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="frames fed to the model at once")
+    parser.add_argument("--draw-workers", type=int, default=DRAW_WORKERS, help="threads drawing the boxes")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="batches waiting between two stages")
+    parser.add_argument("--chunk-frames", type=int, default=CHUNK_FRAMES, help="frames per chunk of detections")
+    parser.add_argument("--stride", type=int, default=STRIDE, help="run the model on one frame every STRIDE frames")
+    parser.add_argument("--target-fps", type=float, default=TARGET_FPS,
+                        help="sample the frames at about this frame rate, overrides --stride")
+    parser.add_argument("--scene-threshold", type=float, default=SCENE_THRESHOLD,
+                        help="only sample the frames that differ from the last sampled one by more than this (0-1)")
+    parser.add_argument("--dedupe-threshold", type=float, default=DEDUPE_THRESHOLD,
+                        help="reuse the detections of the last frame the model ran on for the frames that differ "
+                             "from it by at most this (0-1)")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", default=RESUME,
+                        help="start over instead of resuming from the checkpoint of an interrupted run")
+    parser.add_argument("--no-video", dest="write_video", action="store_false", default=WRITE_VIDEO_OUT,
+                        help="don't write the output video (never written when the frames are sampled)")
+    parser.add_argument("--csv", dest="write_csv", action="store_true", default=WRITE_CSV,
+                        help="also write the detections as CSV")
+    parser.add_argument("--b64", dest="encode_b64", action="store_true", default=ENCODE_B64,
+                        help="write the base64 string of each frame, not recommended")
+    parser.add_argument("--show", action="store_true", default=SHOW_PROCESS,
+                        help="show the video being processed in a window (with a single worker)")
+    parser.add_argument("--quiet", dest="verbose", action="store_false", default=VERBOSE)
+    parser.add_argument("--catalog", help="footage catalog manifest to add the processed videos to")
+    parser.add_argument("--video-url",
+                        help="URL template of the regular video in the catalog, formatted with the name of the video "
+                             "without extension, e.g. http://host/{name}.mp4 or http://host/{name}Original.mp4")
+    return parser
+
+
+def main():
+    parser = build_parser()
+    args = parser.parse_args()
+
+    # Expand the glob patterns, for shells that don't. A pattern matching no file is a typo or a missing video
+    video_paths = []
+    for pattern in args.videos:
+        matches = sorted(glob.glob(pattern))
+        if not matches:
+            parser.error(f"no video matches {pattern}")
+        video_paths.extend(matches)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process_video, video_path, args): video_path for video_path in video_paths}
+
+        for future in as_completed(futures):
+            video_path = futures[future]
+            try:
+                detections_path, stats = future.result()
+            except Exception as exception:
+                print(f"{video_path}: failed ({exception!r})")
+                continue
+
+            print(f"{video_path}: {stats['frames']} frames in {stats['seconds']:.1f}s "
+                  f"({stats['fps']:.2f} fps with {stats['backend']}), "
+                  f"{stats['sampling']['sampling_rate']:.0%} of the frames sampled, "
+                  f"{stats['inferences_saved']} inferences saved -> {detections_path}")
+
+            # The catalog is only written by this process. The entry is named after the video, not its detections
+            if args.catalog is not None:
+                update_manifest(args.catalog, [detections_path], fps=stats["video_fps"], video_url=args.video_url,
+                                sampling=stats["sampling"], names=[os.path.basename(output_prefix(video_path))],
+                                frame_counts=[stats["frame_count"]])
+
+
+if __name__ == '__main__':
+    main()
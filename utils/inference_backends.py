@@ -0,0 +1,152 @@
+"""Runtimes running the object detection model on batches of frames.
+
+Every backend returns the outputs of the Tensorflow Object Detection API for a batch of frames: the boxes as
+(y, x, bottom, right) normalized coordinates of shape [batch, N, 4], the scores of shape [batch, N] (sorted by
+decreasing score), the COCO class ids of shape [batch, N] and the number of detections of each frame of shape
+[batch]. The runtimes are imported when their backend is created, so only the one in use needs to be installed.
+
+    tensorflow    a frozen inference graph (.pb), with a tf.Session
+    onnxruntime   the same graph converted to ONNX (e.g. with tf2onnx), on the CPU
+    opencv        a frozen graph and its text graph (.pbtxt) for the OpenCV DNN module
+"""
+import numpy as np
+
+# Names of the outputs of the Object Detection API graphs, in the order of the output contract
+DETECTION_OUTPUTS = ("detection_boxes:0", "detection_scores:0", "detection_classes:0", "num_detections:0")
+# Size of the frames fed to the OpenCV DNN module (the input size of ssd_mobilenet_v1_coco)
+DNN_INPUT_SIZE = (300, 300)
+
+
+class InferenceBackend:
+    """Interface of the backends. intra_op_threads is the number of threads used inside an operation, and
+    inter_op_threads the number of operations run in parallel. None lets the runtime decide."""
+
+    name = None
+
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=None):
+        self.model_path = model_path
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+    def detect(self, images):
+        """Run the model on a list of frames of the same size, returns (boxes, scores, classes, num)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TensorflowBackend(InferenceBackend):
+    """A frozen Tensorflow graph, run in a session."""
+
+    name = "tensorflow"
+
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=None):
+        super().__init__(model_path, intra_op_threads, inter_op_threads)
+        import tensorflow as tf
+
+        # Load a (frozen) Tensorflow model into memory
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            od_graph_def = tf.GraphDef()
+            with tf.gfile.GFile(model_path, 'rb') as fid:
+                od_graph_def.ParseFromString(fid.read())
+                tf.import_graph_def(od_graph_def, name='')
+
+        config = tf.ConfigProto(intra_op_parallelism_threads=intra_op_threads or 0,
+                                inter_op_parallelism_threads=inter_op_threads or 0)
+        self.session = tf.Session(graph=self.graph, config=config)
+
+        # Definite input and output Tensors for the graph
+        self.image_tensor = self.graph.get_tensor_by_name('image_tensor:0')
+        self.output_tensors = [self.graph.get_tensor_by_name(name) for name in DETECTION_OUTPUTS]
+
+    def detect(self, images):
+        boxes, scores, classes, num = self.session.run(self.output_tensors,
+                                                       feed_dict={self.image_tensor: np.stack(images)})
+        return boxes, scores, classes.astype(np.int32), num.astype(np.int32)
+
+    def close(self):
+        self.session.close()
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """An Object Detection API graph converted to ONNX, run by ONNX Runtime on the CPU."""
+
+    name = "onnxruntime"
+
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=None):
+        super().__init__(model_path, intra_op_threads, inter_op_threads)
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+
+        self.session = onnxruntime.InferenceSession(model_path, sess_options=options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def detect(self, images):
+        boxes, scores, classes, num = self.session.run(list(DETECTION_OUTPUTS), {self.input_name: np.stack(images)})
+        return boxes, scores, classes.astype(np.int32), num.astype(np.int32)
+
+
+class OpenCvDnnBackend(InferenceBackend):
+    """A frozen Tensorflow graph run by the OpenCV DNN module, which needs the text graph generated for it (see
+    tf_text_graph_ssd.py in the OpenCV samples). OpenCV has a single thread pool, so inter_op_threads is ignored."""
+
+    name = "opencv"
+
+    def __init__(self, model_path, intra_op_threads=None, inter_op_threads=None, config_path=None):
+        super().__init__(model_path, intra_op_threads, inter_op_threads)
+        import cv2 as cv
+
+        self.cv = cv
+        if intra_op_threads:
+            cv.setNumThreads(intra_op_threads)
+        self.net = cv.dnn.readNetFromTensorflow(model_path, config_path)
+
+    def detect(self, images):
+        blob = self.cv.dnn.blobFromImages(images, size=DNN_INPUT_SIZE)
+        self.net.setInput(blob)
+
+        # The detections of the whole batch, one row (image, class, score, left, top, right, bottom) per box
+        detections = self.net.forward().reshape(-1, 7)
+        detections = detections[detections[:, 2] > 0]
+        image_ids = detections[:, 0].astype(np.int64)
+
+        num = np.bincount(image_ids, minlength=len(images)).astype(np.int32)
+        max_num = int(num.max()) if len(num) > 0 else 0
+        boxes = np.zeros((len(images), max_num, 4), dtype=np.float32)
+        scores = np.zeros((len(images), max_num), dtype=np.float32)
+        classes = np.zeros((len(images), max_num), dtype=np.int32)
+
+        for image_id in range(len(images)):
+            rows = detections[image_ids == image_id]
+            rows = rows[np.argsort(-rows[:, 2], kind="mergesort")]
+            boxes[image_id, :len(rows)] = rows[:, [4, 3, 6, 5]]  # (left, top, right, bottom) to (y, x, bottom, right)
+            scores[image_id, :len(rows)] = rows[:, 2]
+            classes[image_id, :len(rows)] = rows[:, 1]
+
+        return boxes, scores, classes, num
+
+
+BACKENDS = {backend.name: backend for backend in (TensorflowBackend, OnnxRuntimeBackend, OpenCvDnnBackend)}
+
+
+def create_backend(name, model_path, intra_op_threads=None, inter_op_threads=None, **options):
+    """Create the backend of the given name, options are passed to its constructor (e.g. config_path)."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](model_path, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads,
+                          **options)
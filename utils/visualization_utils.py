@@ -21,16 +21,16 @@ The functions do not return a value, instead they modify the image itself.
 """
 import collections
 import functools
-# Set headless-friendly backend.
-import matplotlib; matplotlib.use('Agg')  # pylint: disable=multiple-statements
-import matplotlib.pyplot as plt  # pylint: disable=g-import-not-at-top
 import numpy as np
 import PIL.Image as Image
 import PIL.ImageColor as ImageColor
 import PIL.ImageDraw as ImageDraw
 import PIL.ImageFont as ImageFont
 import six
-import tensorflow as tf
+
+# Tensorflow and matplotlib are only imported by the functions building
+# Tensorflow ops and summaries, so the numpy drawing functions (used by the
+# ingest with any inference backend) don't need them installed.
 
 # from object_detection.core import standard_fields as fields  # Commented out by xhlulu
 
@@ -64,6 +64,22 @@ STANDARD_COLORS = [
 ]
 
 
+@functools.lru_cache(maxsize=None)
+def _get_font(size=24):
+  """Loads the font of the display strings, once per size."""
+  try:
+    return ImageFont.truetype('arial.ttf', size)
+  except IOError:
+    return ImageFont.load_default()
+
+
+@functools.lru_cache(maxsize=4096)
+def _get_text_size(font, display_str):
+  """Returns the (width, height) of a display string, the strings repeat from a
+  frame to the next."""
+  return font.getsize(display_str)
+
+
 def save_image_array_as_png(image, output_path):
   """Saves an image (represented as a numpy array) to PNG.
 
@@ -71,6 +87,7 @@ def save_image_array_as_png(image, output_path):
     image: a numpy array with shape [height, width, 3].
     output_path: path to which image should be written.
   """
+  import tensorflow as tf  # pylint: disable=g-import-not-at-top
   image_pil = Image.fromarray(np.uint8(image)).convert('RGB')
   with tf.gfile.Open(output_path, 'w') as fid:
     image_pil.save(fid, 'PNG')
@@ -170,15 +187,12 @@ def draw_bounding_box_on_image(image,
     (left, right, top, bottom) = (xmin, xmax, ymin, ymax)
   draw.line([(left, top), (left, bottom), (right, bottom),
              (right, top), (left, top)], width=thickness, fill=color)
-  try:
-    font = ImageFont.truetype('arial.ttf', 24)
-  except IOError:
-    font = ImageFont.load_default()
+  font = _get_font()
 
   # If the total height of the display strings added to the top of the bounding
   # box exceeds the top of the image, stack the strings below the bounding box
   # instead of above.
-  display_str_heights = [font.getsize(ds)[1] for ds in display_str_list]
+  display_str_heights = [_get_text_size(font, ds)[1] for ds in display_str_list]
   # Each display_str has a top and bottom margin of 0.05x.
   total_display_str_height = (1 + 2 * 0.05) * sum(display_str_heights)
 
@@ -188,7 +202,7 @@ def draw_bounding_box_on_image(image,
     text_bottom = bottom + total_display_str_height
   # Reverse list and print from bottom to top.
   for display_str in display_str_list[::-1]:
-    text_width, text_height = font.getsize(display_str)
+    text_width, text_height = _get_text_size(font, display_str)
     margin = np.ceil(0.05 * text_height)
     draw.rectangle(
         [(left, text_bottom - text_height - 2 * margin), (left + text_width,
@@ -336,6 +350,7 @@ def draw_bounding_boxes_on_image_tensors(images,
   Returns:
     4D image tensor of type uint8, with boxes drawn on top.
   """
+  import tensorflow as tf  # pylint: disable=g-import-not-at-top
   visualization_keyword_args = {
       'use_normalized_coordinates': True,
       'max_boxes_to_draw': max_boxes_to_draw,
@@ -399,6 +414,7 @@ def draw_side_by_side_evaluation_image(eval_dict,
     A [1, H, 2 * W, C] uint8 tensor. The subimage on the left corresponds to
       detections, while the subimage on the right corresponds to groundtruth.
   """
+  import tensorflow as tf  # pylint: disable=g-import-not-at-top
   detection_fields = fields.DetectionResultFields()
   input_data_fields = fields.InputDataFields()
   instance_masks = None
@@ -623,6 +639,32 @@ def visualize_boxes_and_labels_on_image_array(
           box_to_color_map[box] = STANDARD_COLORS[
               classes[i] % len(STANDARD_COLORS)]
 
+  # Without masks, which are blended on the array, draw all the boxes on a
+  # single PIL image, converted from the array and back only once per image.
+  if instance_masks is None and instance_boundaries is None:
+    image_pil = Image.fromarray(np.uint8(image)).convert('RGB')
+    for box, color in box_to_color_map.items():
+      ymin, xmin, ymax, xmax = box
+      draw_bounding_box_on_image(
+          image_pil,
+          ymin,
+          xmin,
+          ymax,
+          xmax,
+          color=color,
+          thickness=line_thickness,
+          display_str_list=box_to_display_str_map[box],
+          use_normalized_coordinates=use_normalized_coordinates)
+      if keypoints is not None:
+        draw_keypoints_on_image(
+            image_pil,
+            box_to_keypoints_map[box],
+            color=color,
+            radius=line_thickness / 2,
+            use_normalized_coordinates=use_normalized_coordinates)
+    np.copyto(image, np.array(image_pil))
+    return image
+
   # Draw all boxes onto image.
   for box, color in box_to_color_map.items():
     ymin, xmin, ymax, xmax = box
@@ -670,6 +712,10 @@ def add_cdf_image_summary(values, name):
     values: a 1-D float32 tensor containing the values.
     name: name for the image summary.
   """
+  # Set headless-friendly backend.
+  import matplotlib; matplotlib.use('Agg')  # pylint: disable=multiple-statements
+  import matplotlib.pyplot as plt  # pylint: disable=g-import-not-at-top
+  import tensorflow as tf  # pylint: disable=g-import-not-at-top
   def cdf_plot(values):
     """Numpy function to plot CDF."""
     normalized_values = values / np.sum(values)
@@ -701,6 +747,10 @@ def add_hist_image_summary(values, bins, name):
     bins: bin edges which will be directly passed to np.histogram.
     name: name for the image summary.
   """
+  # Set headless-friendly backend.
+  import matplotlib; matplotlib.use('Agg')  # pylint: disable=multiple-statements
+  import matplotlib.pyplot as plt  # pylint: disable=g-import-not-at-top
+  import tensorflow as tf  # pylint: disable=g-import-not-at-top
 
   def hist_plot(values, bins):
     """Numpy function to plot hist."""